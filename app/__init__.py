@@ -27,10 +27,29 @@ def create_app():
         os.makedirs(os.path.join(app.root_path, '..', 'instance'), exist_ok=True)
         
         # Initialize database
+        from .sqlite_profile import configure_sqlite
+        configure_sqlite(app)
         db.init_app(app)
         
+        from .write_queue import write_queue
+        write_queue.init_app(app)
+        
+        # Template caching and response compression
+        from .cache import init_template_cache, seed_data_versions
+        from .compression import init_compression
+        init_template_cache(app)
+        init_compression(app)
+        
         # Import models here to avoid circular imports
-        from .models import Caregiver, Shift
+        from .models import Caregiver, Shift, ShiftArchive, ShiftRollup, CaregiverWeekHours, CaregiverWeekFairness, ShiftType, DataVersion, ScheduleChange
+        from .models import RotationTemplate, RotationEntry, RotationSkip, PayrollPeriod, Facility, GapAlert
+        from . import aggregates  # Registers the week-hours flush hook
+        from . import fairness  # Registers the fairness counter hook
+        from . import payroll  # Registers the payroll cache invalidation hook
+        from . import facilities  # Registers the facility assignment hook
+        from . import events  # Registers the change publisher
+        from . import changelog  # Registers the change log writer
+        from .shift_types import seed_shift_types
         
         with app.app_context():
             logger.debug("Creating database tables...")
@@ -41,9 +60,15 @@ def create_app():
                 db.drop_all()
                 logger.debug("Tables dropped successfully")
             
+            missing_facility = facilities.tables_missing_facility()
             db.create_all()
             logger.debug("Tables created successfully")
             
+            facilities.seed_facilities(missing_facility)
+            changelog.widen_entity_ids()
+            seed_shift_types()
+            seed_data_versions()
+            
             # Initialize caregivers if none exist
             if Caregiver.query.count() == 0:
                 logger.debug("Initializing caregivers...")
@@ -111,32 +136,51 @@ def create_app():
                     }
                 }
                 
-                # Add shifts to database
+                # Store the week as a one-week rotation rather than one row per shift; later
+                # weeks are left open for the generator and manual assignments
+                rotation = RotationTemplate(name='Initial schedule', start_date=monday, cycle_weeks=1,
+                                            until=monday + timedelta(days=6))
                 days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                 for i, day in enumerate(days):
-                    date = monday + timedelta(days=i)
                     logger.debug(f"Adding shifts for {day}")
                     for shift_type, caregiver_name in schedule[day].items():
                         if caregiver_name in caregivers:
-                            shift = Shift(
-                                date=date,
+                            rotation.entries.append(RotationEntry(
+                                weekday=i,
                                 shift_type=shift_type,
                                 caregiver_id=caregivers[caregiver_name].id
-                            )
-                            db.session.add(shift)
+                            ))
                             logger.debug(f"Added shift: {day} - {shift_type} - {caregiver_name}")
                         else:
                             logger.warning(f"Caregiver {caregiver_name} not found in database")
+                db.session.add(rotation)
                 
                 db.session.commit()
                 logger.debug("Initial schedule added successfully")
             else:
                 logger.debug(f"Found {Caregiver.query.count()} existing caregivers, skipping initialization")
+            
+            # Backfill the weekly hours aggregate for databases created before it existed
+            if CaregiverWeekHours.query.first() is None and Shift.query.first() is not None:
+                logger.debug("Backfilling caregiver week hours...")
+                aggregates.rebuild_week_hours()
+            if CaregiverWeekFairness.query.first() is None and Shift.query.first() is not None:
+                logger.debug("Backfilling caregiver fairness counters...")
+                fairness.rebuild_fairness()
+        
+        facilities.init_facilities(app)
+        
+        from .gaps import gap_monitor
+        gap_monitor.init_app(app)
         
         # Register blueprints
         from .routes import views
         app.register_blueprint(views)
         
+        # Register CLI commands
+        from .commands import register_commands
+        register_commands(app)
+        
         logger.debug("Application creation completed successfully")
         return app
     except Exception as e:
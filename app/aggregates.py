@@ -0,0 +1,124 @@
+from datetime import timedelta
+from collections import defaultdict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .models import db, Shift, Caregiver, CaregiverWeekHours
+from .shift_types import get_registry
+from .rotations import expand
+from .facilities import current_facility_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+def week_start(date):
+    return date - timedelta(days=date.weekday())
+
+def old_shift_values(shift):
+    """(caregiver_id, date, shift_type) as last persisted."""
+    committed = inspect(shift).committed_state
+    return (
+        committed.get('caregiver_id', shift.caregiver_id),
+        committed.get('date', shift.date),
+        committed.get('shift_type', shift.shift_type)
+    )
+
+def new_shift_values(shift):
+    """(caregiver_id, date, shift_type) as they will be written by this flush."""
+    caregiver_id = shift.caregiver_id
+    if caregiver_id is None or 'caregiver' in inspect(shift).committed_state:
+        # Assigned through the relationship; the FK is only synced during flush
+        caregiver_id = shift.caregiver.id if shift.caregiver else None
+    return caregiver_id, shift.date, shift.shift_type
+
+def shift_changes(session):
+    """Yield (sign, (caregiver_id, date, shift_type)) for every pending shift change."""
+    for obj in session.new:
+        if isinstance(obj, Shift):
+            yield 1, new_shift_values(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Shift):
+            yield -1, old_shift_values(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Shift) and session.is_modified(obj):
+            old, new = old_shift_values(obj), new_shift_values(obj)
+            if old != new:
+                yield -1, old
+                yield 1, new
+
+@event.listens_for(Session, 'before_flush')
+def _update_week_hours(session, flush_context, instances):
+    deltas = defaultdict(lambda: [0, 0])
+    for sign, (caregiver_id, date, shift_type) in shift_changes(session):
+        if caregiver_id is None or date is None:
+            continue
+        entry = deltas[(caregiver_id, week_start(date))]
+        entry[0] += sign
+        entry[1] += sign * get_registry().hours_for(shift_type)
+
+    if not deltas:
+        return
+
+    # Increment in SQL, as data versions do, so concurrent writers to the same week add up
+    with session.no_autoflush:
+        for (caregiver_id, start), (shift_delta, hour_delta) in deltas.items():
+            if not shift_delta and not hour_delta:
+                continue
+            week = session.query(CaregiverWeekHours).filter_by(caregiver_id=caregiver_id, week_start=start)
+            updated = week.update({
+                CaregiverWeekHours.shift_count: CaregiverWeekHours.shift_count + shift_delta,
+                CaregiverWeekHours.hours: CaregiverWeekHours.hours + hour_delta
+            }, synchronize_session='evaluate')
+            if not updated:
+                if shift_delta > 0:
+                    session.add(CaregiverWeekHours(caregiver_id=caregiver_id, week_start=start,
+                                                   shift_count=shift_delta, hours=hour_delta))
+            elif shift_delta < 0:
+                week.filter(CaregiverWeekHours.shift_count <= 0).delete(synchronize_session='evaluate')
+
+def load_week_totals(start_date, caregiver_ids=None):
+    """{caregiver_id: (shift_count, hours)} for the week containing start_date.
+
+    Stored shifts come from the aggregate; rotation shifts are expanded and
+    added on top.
+    """
+    start = week_start(start_date)
+    rows = CaregiverWeekHours.query.join(Caregiver).filter(
+        Caregiver.facility_id == current_facility_id(),
+        CaregiverWeekHours.week_start == start
+    )
+    if caregiver_ids is not None:
+        rows = rows.filter(CaregiverWeekHours.caregiver_id.in_(caregiver_ids))
+    totals = {row.caregiver_id: (row.shift_count, row.hours) for row in rows}
+    for shift in expand(start, start + timedelta(days=7), caregiver_ids):
+        count, hours = totals.get(shift.caregiver_id, (0, 0))
+        totals[shift.caregiver_id] = (count + 1, hours + shift.duration_hours)
+    return totals
+
+def get_week_hours(caregiver_id, start_date):
+    row = CaregiverWeekHours.query.filter_by(
+        caregiver_id=caregiver_id, week_start=week_start(start_date)
+    ).first()
+    return (row.shift_count, row.hours) if row else (0, 0)
+
+def rebuild_week_hours():
+    """Recompute caregiver_week_hours from the live shift table."""
+    from .retention import live_totals
+    try:
+        CaregiverWeekHours.query.delete(synchronize_session=False)
+        count = 0
+        for (caregiver_id, period, start), (shift_count, hours) in live_totals().items():
+            if period != 'week':
+                continue
+            db.session.add(CaregiverWeekHours(
+                caregiver_id=caregiver_id,
+                week_start=start,
+                shift_count=shift_count,
+                hours=hours
+            ))
+            count += 1
+        db.session.commit()
+        logger.info(f"Rebuilt {count} caregiver week rows")
+        return count
+    except Exception:
+        db.session.rollback()
+        raise
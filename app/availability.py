@@ -0,0 +1,85 @@
+from datetime import timedelta
+from .models import Caregiver, CaregiverAvailability, CaregiverTimeOff
+from .shift_types import get_registry, hour_range_mask, WEEK_MASK
+from .facilities import current_facility_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AvailabilityIndex:
+    """Weekly availability/preference masks plus per-date exception masks.
+
+    Built with two queries; every feasibility check afterwards is a couple
+    of integer ANDs.
+    """
+
+    def __init__(self, available, preferred, blocked):
+        self.available = available  # {caregiver_id: 168-bit mask}
+        self.preferred = preferred  # {caregiver_id: 168-bit mask}
+        self.blocked = blocked      # {(caregiver_id, date): 24-bit mask}
+
+    @classmethod
+    def load(cls, start_date, end_date, caregiver_ids=None):
+        """Load masks for time-off exceptions in [start_date, end_date]."""
+        windows = CaregiverAvailability.query
+        time_off = CaregiverTimeOff.query.filter(
+            CaregiverTimeOff.date >= start_date,
+            CaregiverTimeOff.date <= end_date
+        )
+        if caregiver_ids is not None:
+            windows = windows.filter(CaregiverAvailability.caregiver_id.in_(caregiver_ids))
+            time_off = time_off.filter(CaregiverTimeOff.caregiver_id.in_(caregiver_ids))
+        else:
+            facility_id = current_facility_id()
+            windows = windows.join(Caregiver).filter(Caregiver.facility_id == facility_id)
+            time_off = time_off.join(Caregiver).filter(Caregiver.facility_id == facility_id)
+
+        available, preferred = {}, {}
+        for window in windows.all():
+            mask = hour_range_mask(window.weekday * 24 + window.start_hour, window.weekday * 24 + window.end_hour)
+            available[window.caregiver_id] = available.get(window.caregiver_id, 0) | mask
+            if window.preferred:
+                preferred[window.caregiver_id] = preferred.get(window.caregiver_id, 0) | mask
+
+        blocked = {}
+        for entry in time_off.all():
+            key = (entry.caregiver_id, entry.date)
+            blocked[key] = blocked.get(key, 0) | hour_range_mask(entry.start_hour, entry.end_hour)
+
+        return cls(available, preferred, blocked)
+
+    def can_work(self, caregiver_id, date, shift_type):
+        definition = get_registry().get(shift_type)
+        week_mask = definition.week_masks[date.weekday()]
+        if week_mask & self.available.get(caregiver_id, WEEK_MASK) != week_mask:
+            return False
+        blocked = self.blocked.get((caregiver_id, date), 0)
+        if definition.day_mask >> 24:
+            blocked |= self.blocked.get((caregiver_id, date + timedelta(days=1)), 0) << 24
+        return not definition.day_mask & blocked
+
+    def prefers(self, caregiver_id, date, shift_type):
+        week_mask = get_registry().week_mask(shift_type, date.weekday())
+        return week_mask & self.preferred.get(caregiver_id, 0) == week_mask and week_mask != 0
+
+    def feasible(self, caregivers, date, shift_type):
+        # Hoisted version of can_work for filtering a whole roster
+        definition = get_registry().get(shift_type)
+        week_mask = definition.week_masks[date.weekday()]
+        day_mask = definition.day_mask
+        spills = day_mask >> 24
+        next_day = date + timedelta(days=1)
+        available, blocked = self.available, self.blocked
+
+        result = []
+        for cg in caregivers:
+            if week_mask & available.get(cg.id, WEEK_MASK) != week_mask:
+                continue
+            if blocked:
+                day_blocked = blocked.get((cg.id, date), 0)
+                if spills:
+                    day_blocked |= blocked.get((cg.id, next_day), 0) << 24
+                if day_mask & day_blocked:
+                    continue
+            result.append(cg)
+        return result
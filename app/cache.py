@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from flask import g, has_app_context
+from jinja2 import nodes, FileSystemBytecodeCache
+from jinja2.ext import Extension
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .models import db, DataVersion
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Tables whose changes invalidate cached fragments
+VERSIONED_TABLES = ('caregiver', 'shift', 'shift_type', 'facility', 'rotation')
+
+# Tables that share one version; the rotation tables only change together as "rotation"
+VERSION_NAMES = {'rotation_template': 'rotation', 'rotation_entry': 'rotation', 'rotation_skip': 'rotation'}
+
+def version_name(obj):
+    """The data version a row of ``obj``'s table bumps, or None."""
+    table = getattr(obj, '__tablename__', None)
+    table = VERSION_NAMES.get(table, table)
+    return table if table in VERSIONED_TABLES else None
+
+class FragmentCache:
+    """Small thread-safe LRU of rendered template fragments."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+fragment_cache = FragmentCache()
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', version, ... %}...{% endcache %}`` caches the rendered body.
+
+    The key is built from every argument, so passing the data version a
+    fragment depends on makes stale entries unreachable.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key_parts, caller):
+        key = tuple(key_parts)
+        value = fragment_cache.get(key)
+        if value is None:
+            value = caller()
+            fragment_cache.set(key, value)
+        return value
+
+def data_versions():
+    """{table: version} for VERSIONED_TABLES, read once per request."""
+    if has_app_context() and 'data_versions' in g:
+        return g.data_versions
+    versions = {row.name: row.version for row in DataVersion.query.all()}
+    if has_app_context():
+        g.data_versions = versions
+    return versions
+
+def data_version(*tables):
+    versions = data_versions()
+    return tuple(versions.get(table, 0) for table in tables)
+
+@event.listens_for(Session, 'before_flush')
+def _bump_data_versions(session, flush_context, instances):
+    changed = {version_name(obj) for obj in (*session.new, *session.dirty, *session.deleted)}
+    changed.discard(None)
+    if not changed:
+        return
+    with session.no_autoflush:
+        rows = {row.name: row for row in session.query(DataVersion).filter(DataVersion.name.in_(changed))}
+        for table in changed:
+            row = rows.get(table)
+            if row is None:
+                session.add(DataVersion(name=table, version=1))
+            else:
+                row.version = DataVersion.version + 1
+
+@event.listens_for(Session, 'after_commit')
+def _forget_request_versions(session):
+    if has_app_context():
+        g.pop('data_versions', None)
+
+def seed_data_versions():
+    existing = {row.name for row in DataVersion.query.all()}
+    for table in VERSIONED_TABLES:
+        if table not in existing:
+            db.session.add(DataVersion(name=table, version=1))
+    db.session.commit()
+
+def init_template_cache(app):
+    """Enable the fragment cache tag and a persistent Jinja bytecode cache.
+
+    Must run before the app's Jinja environment is first used.
+    """
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = {
+        **app.jinja_options,
+        'extensions': [*app.jinja_options.get('extensions', ()), FragmentCacheExtension],
+        'bytecode_cache': FileSystemBytecodeCache(cache_dir)
+    }
+    app.add_template_global(data_version)
+    logger.debug(f"Jinja bytecode cache at {cache_dir}")
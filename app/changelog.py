@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, text, Integer
+from sqlalchemy.orm import Session
+from .models import db, ScheduleChange, DataVersion
+from .events import collect_changes
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Versions at or below the floor have been compacted away
+FLOOR_NAME = 'schedule_change_floor'
+
+ACTIONS = {
+    'shift_added': ('shift', 'upsert'),
+    'shift_removed': ('shift', 'delete'),
+    'caregiver_added': ('caregiver', 'upsert'),
+    'caregiver_updated': ('caregiver', 'upsert'),
+    'caregiver_removed': ('caregiver', 'delete'),
+    'rotation_changed': ('rotation', 'upsert')
+}
+
+@event.listens_for(Session, 'after_flush')
+def _log_changes(session, flush_context):
+    # Rows added here are written by the next flush, which commit() runs
+    # before completing, so they land in the same transaction
+    for change in collect_changes(session):
+        entity, action = ACTIONS[change['type']]
+        data = change[entity]
+        session.add(ScheduleChange(
+            facility_id=change['facility_id'],
+            entity=entity,
+            entity_id=str(data['id']),
+            action=action,
+            payload=json.dumps(data)
+        ))
+
+def widen_entity_ids():
+    """Store entity ids as text in databases created when they were integers.
+
+    SQLite keeps whatever is inserted, so only other databases are altered.
+    """
+    column = next(c for c in inspect(db.engine).get_columns('schedule_change') if c['name'] == 'entity_id')
+    if db.engine.dialect.name != 'sqlite' and isinstance(column['type'], Integer):
+        logger.info("Changing schedule_change.entity_id to text")
+        db.session.execute(text("ALTER TABLE schedule_change ALTER COLUMN entity_id TYPE VARCHAR(40)"))
+        db.session.commit()
+
+def _entity_id(value):
+    # Stored shift and caregiver ids go back out as numbers
+    return int(value) if str(value).isdigit() else value
+
+def current_version():
+    return db.session.query(func.max(ScheduleChange.version)).scalar() or floor_version()
+
+def floor_version():
+    row = DataVersion.query.get(FLOOR_NAME)
+    return row.version if row else 0
+
+def get_changes(since, limit=500, facility_id=None):
+    """Changes after ``since``, oldest first, optionally for one facility.
+
+    Returns ``reset`` when entries the client still needs were compacted
+    away; the client should then reload everything and continue from
+    ``version``.
+    """
+    version = current_version()
+    if since < floor_version():
+        return {'reset': True, 'version': version, 'changes': [], 'has_more': False}
+
+    rows = ScheduleChange.query.filter(ScheduleChange.version > since)
+    if facility_id is not None:
+        rows = rows.filter(ScheduleChange.facility_id == facility_id)
+    rows = rows.order_by(ScheduleChange.version).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'reset': False,
+        'version': rows[-1].version if has_more else version,
+        'changes': [{
+            'version': row.version,
+            'entity': row.entity,
+            'id': _entity_id(row.entity_id),
+            'action': row.action,
+            'data': json.loads(row.payload)
+        } for row in rows],
+        'has_more': has_more
+    }
+
+def compact_changes(max_age_days=None):
+    """Drop entries superseded by a later change to the same entity.
+
+    With ``max_age_days``, also drop everything older than that and raise
+    the floor so clients behind it are told to reset.
+    """
+    try:
+        latest = db.session.query(func.max(ScheduleChange.version)).group_by(
+            ScheduleChange.entity, ScheduleChange.entity_id
+        )
+        removed = ScheduleChange.query.filter(
+            ~ScheduleChange.version.in_(latest.scalar_subquery())
+        ).delete(synchronize_session=False)
+
+        if max_age_days is not None:
+            cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+            new_floor = db.session.query(func.max(ScheduleChange.version)).filter(
+                ScheduleChange.created_at < cutoff
+            ).scalar()
+            if new_floor:
+                removed += ScheduleChange.query.filter(
+                    ScheduleChange.version <= new_floor
+                ).delete(synchronize_session=False)
+                floor = DataVersion.query.get(FLOOR_NAME)
+                if floor is None:
+                    db.session.add(DataVersion(name=FLOOR_NAME, version=new_floor))
+                else:
+                    floor.version = max(floor.version, new_floor)
+
+        db.session.commit()
+        logger.info(f"Compacted {removed} schedule changes")
+        return removed
+    except Exception:
+        db.session.rollback()
+        raise
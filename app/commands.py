@@ -0,0 +1,55 @@
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+def register_commands(app):
+    @app.cli.command('archive-shifts')
+    @click.option('--weeks', type=int, default=None, help='Retention horizon in weeks (defaults to RETENTION_WEEKS)')
+    def archive_shifts_command(weeks):
+        """Roll up and archive shifts older than the retention horizon."""
+        from .retention import archive_shifts
+        moved = archive_shifts(weeks)
+        click.echo(f"Archived {moved} shifts")
+
+    @app.cli.command('rebuild-week-hours')
+    def rebuild_week_hours_command():
+        """Recompute caregiver_week_hours from the shift table."""
+        from .aggregates import rebuild_week_hours
+        count = rebuild_week_hours()
+        click.echo(f"Rebuilt {count} caregiver week rows")
+
+    @app.cli.command('rebuild-fairness')
+    def rebuild_fairness_command():
+        """Recompute caregiver_week_fairness from the shift table."""
+        from .fairness import rebuild_fairness
+        count = rebuild_fairness()
+        click.echo(f"Rebuilt fairness counters for {count} caregiver weeks")
+
+    @app.cli.command('skip-overridden-rotations')
+    def skip_overridden_rotations_command():
+        """Record skips for rotation shifts hidden by a stored shift in the same slot."""
+        from .models import db, Facility
+        from .facilities import use_facility
+        from .rotations import skip_overridden_slots
+        added = 0
+        for facility in Facility.query.order_by(Facility.id).all():
+            with use_facility(facility.id):
+                added += skip_overridden_slots()
+        db.session.commit()
+        click.echo(f"Added {added} rotation skips")
+
+    @app.cli.command('clear-payroll-cache')
+    def clear_payroll_cache_command():
+        """Drop cached payroll for closed periods (e.g. after changing HOLIDAYS)."""
+        from .payroll import clear_payroll_cache
+        removed = clear_payroll_cache()
+        click.echo(f"Cleared {removed} cached pay periods")
+
+    @app.cli.command('compact-changes')
+    @click.option('--days', type=int, default=None, help='Also drop entries older than this many days')
+    def compact_changes_command(days):
+        """Collapse the schedule change log to the latest entry per entity."""
+        from .changelog import compact_changes
+        removed = compact_changes(days)
+        click.echo(f"Removed {removed} change log entries")
@@ -0,0 +1,46 @@
+from flask import request
+import gzip
+import logging
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json', 'application/javascript')
+
+def _accepted(encoding):
+    return encoding in request.headers.get('Accept-Encoding', '').lower()
+
+def compress_response(response, min_size=500, level=6):
+    if (response.status_code < 200 or response.status_code >= 300 or
+            response.direct_passthrough or response.is_streamed or
+            'Content-Encoding' in response.headers or
+            response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    if brotli is not None and _accepted('br'):
+        response.set_data(brotli.compress(data, quality=min(level, 11)))
+        response.headers['Content-Encoding'] = 'br'
+    elif _accepted('gzip'):
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    return response
+
+def init_compression(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+    level = app.config.get('COMPRESS_LEVEL', 6)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, min_size, level)
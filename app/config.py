@@ -18,19 +18,63 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Per-connection SQLite settings (ignored for other databases)
+    SQLITE_PRAGMAS = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024  # Negative means KiB
+    }
+    
+    # Batch shift and caregiver writes through one writer thread per process
+    WRITE_QUEUE = os.environ.get('WRITE_QUEUE', '0') == '1'
+    WRITE_QUEUE_MAX_BATCH = 32
+    WRITE_QUEUE_MAX_DELAY_MS = 5
+    
     # Environment configuration
     DEBUG = os.environ.get('FLASK_ENV') == 'development'
     
     # Shift types
     SHIFTS = ['Morning', 'Afternoon', 'Night']
+    
+    # Response compression (gzip, or brotli when the package is installed)
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    
+    # Fairness counters are summed over this many weeks
+    FAIRNESS_WINDOW_WEEKS = int(os.environ.get('FAIRNESS_WINDOW_WEEKS', 8))
+    
+    # Time budget for the local-search pass after generating a schedule (0 disables it)
+    POLISH_SECONDS = float(os.environ.get('POLISH_SECONDS', 2))
+    
+    # Pay periods are PAY_PERIOD_WEEKS long, counted from the Monday of PAY_PERIOD_ANCHOR
+    PAY_PERIOD_WEEKS = int(os.environ.get('PAY_PERIOD_WEEKS', 2))
+    PAY_PERIOD_ANCHOR = os.environ.get('PAY_PERIOD_ANCHOR', '2024-01-01')
+    
+    # Caregivers per page in the caregiver grid, the manage page and /api/caregivers
+    ROSTER_PAGE_SIZE = int(os.environ.get('ROSTER_PAGE_SIZE', 20))
+    
+    # Coverage gaps are tracked this many weeks ahead; with GAP_ALERTS=1 gaps starting
+    # within GAP_ALERT_LEAD_HOURS are logged and posted to GAP_ALERT_WEBHOOK (if set)
+    GAP_HORIZON_WEEKS = int(os.environ.get('GAP_HORIZON_WEEKS', 4))
+    GAP_ALERTS = os.environ.get('GAP_ALERTS', '0') == '1'
+    GAP_ALERT_LEAD_HOURS = int(os.environ.get('GAP_ALERT_LEAD_HOURS', 48))
+    GAP_ALERT_WEBHOOK = os.environ.get('GAP_ALERT_WEBHOOK')
+    GAP_MONITOR_INTERVAL = int(os.environ.get('GAP_MONITOR_INTERVAL', 60))
+    
+    # Retention: shifts older than this many weeks are moved to the archive
+    RETENTION_WEEKS = int(os.environ.get('RETENTION_WEEKS', 52))
 
 class ShiftConfig:
+    # Defaults used to seed the shift_type table; the table is authoritative afterwards.
+    # headcount is the number of caregivers required Monday..Sunday.
     SHIFTS = {
-        'A': {'name': 'A Shift', 'time': '6:00 AM - 2:00 PM', 'start_hour': 6, 'duration': 8, 'color': '#90EE90'},
-        'B': {'name': 'B Shift', 'time': '4:00 PM - 12:00 AM', 'start_hour': 16, 'duration': 8, 'color': '#87CEEB'},
-        'C': {'name': 'C Shift', 'time': '12:00 AM - 8:00 AM', 'start_hour': 0, 'duration': 8, 'color': '#DDA0DD'},
-        'G1': {'name': 'G1 Shift', 'time': '12:00 PM - 8:00 PM', 'start_hour': 12, 'duration': 8, 'color': '#F0E68C'},
-        'G2': {'name': 'G2 Shift', 'time': '9:00 AM - 5:00 PM', 'start_hour': 9, 'duration': 8, 'color': '#FFB6C1'}
+        'A': {'name': 'A Shift', 'start_hour': 6, 'duration': 8, 'color': '#90EE90', 'headcount': (1, 1, 1, 1, 1, 1, 1)},
+        'G2': {'name': 'G2 Shift', 'start_hour': 9, 'duration': 8, 'color': '#FFB6C1', 'headcount': (0, 0, 0, 0, 0, 1, 1)},
+        'G1': {'name': 'G1 Shift', 'start_hour': 12, 'duration': 8, 'color': '#F0E68C', 'headcount': (1, 1, 1, 1, 1, 1, 1)},
+        'B': {'name': 'B Shift', 'start_hour': 16, 'duration': 8, 'color': '#87CEEB', 'headcount': (1, 1, 1, 1, 1, 1, 1)},
+        'C': {'name': 'C Shift', 'start_hour': 0, 'duration': 8, 'color': '#DDA0DD', 'headcount': (1, 1, 1, 1, 1, 1, 1)}
     }
     
     # Updated list of actual caregivers
@@ -38,4 +82,10 @@ class ShiftConfig:
     
     SHIFTS_PER_WEEK = 5  # Each caregiver works 5 days
     HOURS_PER_SHIFT = 8  # Each shift is 8 hours
-    HOURS_PER_WEEK = 40  # Total weekly hours per caregiver 
\ No newline at end of file
+    HOURS_PER_WEEK = 40  # Total weekly hours per caregiver
+    MIN_REST_HOURS = 8  # Minimum gap between the end of one shift and the start of the next
+    MAX_CONSECUTIVE_DAYS = 6  # Longest run of working days allowed
+    NIGHT_START_HOUR = 22  # A shift counts as a night shift if most of it falls in this window
+    NIGHT_END_HOUR = 6
+    # Holiday dates (YYYY-MM-DD, comma separated) for the fairness counters
+    HOLIDAYS = frozenset(d.strip() for d in os.environ.get('HOLIDAYS', '').split(',') if d.strip()) 
\ No newline at end of file
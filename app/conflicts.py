@@ -0,0 +1,109 @@
+from datetime import timedelta
+from collections import defaultdict
+from .models import Shift
+from .config import ShiftConfig
+from .shift_types import get_registry, hour_range_mask
+from .rotations import expand
+from .facilities import current_facility_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _trailing_ones(x):
+    return ((~x) & (x + 1)).bit_length() - 1
+
+class OccupancyIndex:
+    """Hour-resolution occupancy per caregiver for rest, overlap and run-length checks.
+
+    Bit n of a caregiver's hour mask is hour n counted from midnight of
+    ``base``; bit n of the day mask is day n. Each check is a handful of
+    shifts and ANDs on those integers.
+    """
+
+    def __init__(self, base, min_rest=None, max_consecutive=None):
+        self.base = base
+        self.min_rest = ShiftConfig.MIN_REST_HOURS if min_rest is None else min_rest
+        self.max_consecutive = ShiftConfig.MAX_CONSECUTIVE_DAYS if max_consecutive is None else max_consecutive
+        self.hours = defaultdict(int)
+        self.day_counts = defaultdict(int)  # (caregiver_id, day offset) -> shifts that day
+        self.days = defaultdict(int)
+
+    @classmethod
+    def padding_days(cls):
+        return max(ShiftConfig.MAX_CONSECUTIVE_DAYS, ShiftConfig.MIN_REST_HOURS // 24 + 1) + 1
+
+    @classmethod
+    def load(cls, start_date, end_date, caregiver_ids=None):
+        """Index stored and rotation shifts that can affect assignments dated [start_date, end_date)."""
+        pad = timedelta(days=cls.padding_days())
+        index = cls(start_date - pad)
+        query = Shift.query.filter(
+            Shift.facility_id == current_facility_id(),
+            Shift.date >= start_date - pad,
+            Shift.date < end_date + pad
+        )
+        if caregiver_ids is not None:
+            query = query.filter(Shift.caregiver_id.in_(caregiver_ids))
+        for shift in query.all():
+            index.add(shift.caregiver_id, shift.date, shift.shift_type)
+        for shift in expand(start_date - pad, end_date + pad, caregiver_ids):
+            index.add(shift.caregiver_id, shift.date, shift.shift_type)
+        return index
+
+    def copy(self):
+        index = OccupancyIndex(self.base, self.min_rest, self.max_consecutive)
+        index.hours.update(self.hours)
+        index.day_counts.update(self.day_counts)
+        index.days.update(self.days)
+        return index
+
+    def _offset(self, date):
+        offset = (date - self.base).days
+        if offset < 0:
+            raise ValueError(f"{date} is before the indexed range starting {self.base}")
+        return offset
+
+    def shift_bits(self, date, shift_type):
+        return get_registry().day_mask(shift_type) << (self._offset(date) * 24)
+
+    def add(self, caregiver_id, date, shift_type):
+        offset = self._offset(date)
+        self.hours[caregiver_id] |= get_registry().day_mask(shift_type) << (offset * 24)
+        self.day_counts[(caregiver_id, offset)] += 1
+        self.days[caregiver_id] |= 1 << offset
+
+    def remove(self, caregiver_id, date, shift_type):
+        offset = self._offset(date)
+        self.hours[caregiver_id] &= ~(get_registry().day_mask(shift_type) << (offset * 24))
+        self.day_counts[(caregiver_id, offset)] -= 1
+        if self.day_counts[(caregiver_id, offset)] <= 0:
+            del self.day_counts[(caregiver_id, offset)]
+            self.days[caregiver_id] &= ~(1 << offset)
+
+    def consecutive_days(self, caregiver_id, offset):
+        """Length of the run of working days through ``offset`` if it were worked."""
+        days = self.days[caregiver_id] | (1 << offset)
+        run_forward = _trailing_ones(days >> offset)
+        below = days & ((1 << offset) - 1)
+        gap = ~below & ((1 << offset) - 1)
+        run_back = offset - gap.bit_length() if gap else offset
+        return run_forward + run_back
+
+    def check(self, caregiver_id, date, shift_type):
+        """Return a list of rule violations for the proposed assignment (empty if legal)."""
+        offset = self._offset(date)
+        occupied = self.hours[caregiver_id]
+        bits = get_registry().day_mask(shift_type) << (offset * 24)
+        start, end = (bits & -bits).bit_length() - 1, bits.bit_length()
+
+        conflicts = []
+        if occupied & bits:
+            conflicts.append('overlaps an existing shift')
+        elif occupied & hour_range_mask(max(start - self.min_rest, 0), end + self.min_rest):
+            conflicts.append(f'less than {self.min_rest} hours rest from an adjacent shift')
+        if self.consecutive_days(caregiver_id, offset) > self.max_consecutive:
+            conflicts.append(f'more than {self.max_consecutive} consecutive working days')
+        return conflicts
+
+    def can_assign(self, caregiver_id, date, shift_type):
+        return not self.check(caregiver_id, date, shift_type)
@@ -0,0 +1,159 @@
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from .models import Shift, Caregiver, RotationTemplate, RotationEntry, RotationSkip, DataVersion
+from .cache import VERSIONED_TABLES
+from .aggregates import old_shift_values, new_shift_values
+import itertools
+import json
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EventBus:
+    """In-process pub/sub: each subscriber gets its own bounded queue.
+
+    A subscriber that falls too far behind is sent a ``resync`` event and
+    skipped until it drains, so a stalled client never blocks publishers.
+    """
+
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, payload):
+        payload = dict(payload, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                logger.warning("Event subscriber is behind; asking it to resync")
+                try:
+                    q.get_nowait()
+                    q.put_nowait({'type': 'resync', 'id': payload['id']})
+                except (queue.Empty, queue.Full):
+                    pass
+        return payload['id']
+
+bus = EventBus()
+
+def format_sse(payload):
+    return f"id: {payload['id']}\nevent: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+def _shift_payload(shift_id, values, caregiver_name=None):
+    from .shift_types import get_registry
+    caregiver_id, date, shift_type = values
+    definition = get_registry().get(shift_type)
+    return {
+        'id': shift_id,
+        'date': date.isoformat(),
+        'shift_type': shift_type,
+        'caregiver_id': caregiver_id,
+        'caregiver_name': caregiver_name,
+        'time_range': definition.time,
+        'hours': definition.duration
+    }
+
+def _caregiver_name(session, caregiver_id):
+    caregiver = session.get(Caregiver, caregiver_id) if caregiver_id is not None else None
+    return caregiver.name if caregiver else None
+
+def collect_changes(session):
+    """Event payloads for the shift and caregiver changes written by the current flush.
+
+    Call from an after_flush hook, when new rows have ids but the
+    pre-flush history is still available.
+    """
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Shift):
+            name = _caregiver_name(session, obj.caregiver_id)
+            changes.append({'type': 'shift_added', 'facility_id': obj.facility_id,
+                            'shift': _shift_payload(obj.id, new_shift_values(obj), name)})
+        elif isinstance(obj, Caregiver):
+            changes.append({'type': 'caregiver_added', 'facility_id': obj.facility_id,
+                            'caregiver': {'id': obj.id, 'name': obj.name}})
+    for obj in session.deleted:
+        if isinstance(obj, Shift):
+            changes.append({'type': 'shift_removed', 'facility_id': obj.facility_id,
+                            'shift': _shift_payload(obj.id, old_shift_values(obj))})
+        elif isinstance(obj, Caregiver):
+            changes.append({'type': 'caregiver_removed', 'facility_id': obj.facility_id,
+                            'caregiver': {'id': obj.id, 'name': obj.name}})
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Shift):
+            old, new = old_shift_values(obj), new_shift_values(obj)
+            if old != new:
+                name = _caregiver_name(session, new[0])
+                changes.append({'type': 'shift_removed', 'facility_id': obj.facility_id,
+                                'shift': _shift_payload(obj.id, old)})
+                changes.append({'type': 'shift_added', 'facility_id': obj.facility_id,
+                                'shift': _shift_payload(obj.id, new, name)})
+        elif isinstance(obj, Caregiver):
+            changes.append({'type': 'caregiver_updated', 'facility_id': obj.facility_id,
+                            'caregiver': {'id': obj.id, 'name': obj.name}})
+    # Template and entry edits can move many expanded shifts at once; clients refetch the range
+    rotations = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, RotationTemplate):
+            rotations[obj.id] = obj.facility_id
+        elif isinstance(obj, RotationEntry) and obj.template_id not in rotations:
+            template = obj.template or session.get(RotationTemplate, obj.template_id)
+            rotations[obj.template_id] = template.facility_id if template else None
+    # A new skip removes one occurrence, which is sent like any other removed shift
+    for obj in (*session.new, *session.deleted):
+        if not isinstance(obj, RotationSkip) or obj.template_id in rotations:
+            continue
+        template = obj.template or session.get(RotationTemplate, obj.template_id)
+        entry = obj.entry or session.get(RotationEntry, obj.entry_id)
+        if obj in session.new and entry is not None:
+            changes.append({'type': 'shift_removed', 'facility_id': template.facility_id,
+                            'shift': _shift_payload(f"rotation-{entry.id}-{obj.date.isoformat()}",
+                                                    (entry.caregiver_id, obj.date, entry.shift_type))})
+        else:
+            rotations[obj.template_id] = template.facility_id if template else None
+    for template_id in sorted(r for r in rotations if r is not None):
+        changes.append({'type': 'rotation_changed', 'facility_id': rotations[template_id],
+                        'rotation': {'id': template_id}})
+    return changes
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    changes = collect_changes(session)
+    if changes:
+        # The data versions this flush wrote, so subscribers can tell which
+        # versions they have seen events for; the rows stay locked until commit
+        versions = dict(session.connection().execute(
+            select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(VERSIONED_TABLES))
+        ).all())
+        session.info.setdefault('pending_events', []).extend(dict(change, versions=versions) for change in changes)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    for payload in session.info.pop('pending_events', []):
+        bus.publish(payload)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_events(session):
+    session.info.pop('pending_events', None)
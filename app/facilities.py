@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request, session, jsonify
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import Session
+from .models import db, Facility, Caregiver, Shift, RotationTemplate, PayrollPeriod
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FACILITY = 'Main'
+
+# Tables that gained facility_id after their first release
+FACILITY_TABLES = ('caregiver', 'shift', 'shift_archive', 'rotation_template', 'schedule_change')
+
+_default_facility_id = None
+
+def default_facility_id():
+    """The first facility's id; cached, since facilities are never deleted."""
+    global _default_facility_id
+    if _default_facility_id is None:
+        _default_facility_id = db.session.query(func.min(Facility.id)).scalar()
+    return _default_facility_id
+
+def current_facility_id():
+    """The facility the current request or job works on.
+
+    Set per request by _select_facility; elsewhere (CLI, background
+    threads without use_facility) it is the first facility.
+    """
+    if g.get('facility_id') is None:
+        g.facility_id = default_facility_id()
+    return g.facility_id
+
+@contextmanager
+def use_facility(facility_id):
+    previous = g.get('facility_id')
+    g.facility_id = facility_id
+    try:
+        yield
+    finally:
+        g.facility_id = previous
+
+def bind_facility(job):
+    """Wrap ``job`` so it runs in the caller's facility, e.g. on the write queue thread."""
+    facility_id = current_facility_id()
+
+    @wraps(job)
+    def run(*args, **kwargs):
+        with use_facility(facility_id):
+            return job(*args, **kwargs)
+    return run
+
+def _select_facility():
+    # ?facility= also sticks in the session so links between pages keep it
+    facility_id = request.args.get('facility', type=int)
+    if facility_id is None:
+        facility_id = request.headers.get('X-Facility-Id', type=int)
+    if facility_id is not None:
+        if db.session.get(Facility, facility_id) is None:
+            return jsonify({'error': 'Unknown facility'}), 404
+        if 'facility' in request.args:
+            session['facility_id'] = facility_id
+    else:
+        facility_id = session.get('facility_id')
+        if facility_id is not None and db.session.get(Facility, facility_id) is None:
+            session.pop('facility_id')
+            facility_id = None
+    g.facility_id = facility_id or default_facility_id()
+
+def init_facilities(app):
+    app.before_request(_select_facility)
+
+    @app.context_processor
+    def inject_facilities():
+        return {
+            'facilities': Facility.query.order_by(Facility.id).all(),
+            'current_facility_id': current_facility_id()
+        }
+
+@event.listens_for(Session, 'before_flush')
+def _assign_facility(session, flush_context, instances):
+    # Shifts take their caregiver's facility; new caregivers and rotations the current one
+    pending = [obj for obj in session.new
+               if isinstance(obj, (Caregiver, Shift, RotationTemplate)) and obj.facility_id is None]
+    if not pending:
+        return
+    pending.sort(key=lambda obj: isinstance(obj, Shift))
+    with session.no_autoflush:
+        for obj in pending:
+            if isinstance(obj, Shift):
+                caregiver = obj.caregiver or session.get(Caregiver, obj.caregiver_id)
+                obj.facility_id = caregiver.facility_id if caregiver else current_facility_id()
+            else:
+                obj.facility_id = current_facility_id()
+
+def tables_missing_facility():
+    """Tables from before facilities existed; call before db.create_all().
+
+    The payroll cache is keyed by facility now, so an old copy is dropped
+    and recreated empty.
+    """
+    inspector = inspect(db.engine)
+    existing = set(inspector.get_table_names())
+    if 'payroll_period' in existing and 'facility_id' not in {c['name'] for c in inspector.get_columns('payroll_period')}:
+        PayrollPeriod.__table__.drop(db.engine)
+    return [name for name in FACILITY_TABLES
+            if name in existing and 'facility_id' not in {c['name'] for c in inspector.get_columns(name)}]
+
+def seed_facilities(missing=()):
+    """Create the default facility and move rows of upgraded tables into it."""
+    facility_id = default_facility_id()
+    if facility_id is None:
+        facility = Facility(name=DEFAULT_FACILITY)
+        db.session.add(facility)
+        db.session.commit()
+        facility_id = facility.id
+
+    for name in missing:
+        table = db.metadata.tables[name]
+        logger.info(f"Adding facility_id to {name}")
+        db.session.execute(text(f"ALTER TABLE {name} ADD COLUMN facility_id INTEGER"))
+        db.session.execute(table.update().values(facility_id=facility_id))
+        db.session.commit()
+        for index in table.indexes:
+            if 'facility_id' in index.columns:
+                index.create(db.engine, checkfirst=True)
+    return facility_id
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from flask import current_app
+from collections import defaultdict
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from .models import db, Shift, ShiftArchive, Caregiver, CaregiverWeekFairness, CaregiverWeekHours
+from .aggregates import shift_changes, week_start
+from .shift_types import get_registry
+from .config import ShiftConfig
+from .facilities import current_facility_id
+from .rotations import expand
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('night_shifts', 'weekend_shifts', 'holiday_shifts')
+
+def shift_flags(date, shift_type):
+    """(night, weekend, holiday) as 0/1 for one shift."""
+    return (
+        int(get_registry().get(shift_type).night),
+        int(date.weekday() >= 5),
+        int(date.isoformat() in ShiftConfig.HOLIDAYS)
+    )
+
+@event.listens_for(Session, 'before_flush')
+def _update_fairness(session, flush_context, instances):
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for sign, (caregiver_id, date, shift_type) in shift_changes(session):
+        if caregiver_id is None or date is None:
+            continue
+        flags = shift_flags(date, shift_type)
+        if not any(flags):
+            continue
+        entry = deltas[(caregiver_id, week_start(date))]
+        for i, flag in enumerate(flags):
+            entry[i] += sign * flag
+
+    if deltas:
+        apply_fairness_deltas(session, deltas)
+
+def apply_fairness_deltas(session, deltas):
+    """Add {(caregiver_id, week_start): [nights, weekends, holidays]} to the weekly counters."""
+    # Incremented in SQL, like the week hours, so concurrent writers to the same week add up
+    with session.no_autoflush:
+        for (caregiver_id, start), counts in deltas.items():
+            if not any(counts):
+                continue
+            week = session.query(CaregiverWeekFairness).filter_by(caregiver_id=caregiver_id, week_start=start)
+            updated = week.update({
+                getattr(CaregiverWeekFairness, name): getattr(CaregiverWeekFairness, name) + delta
+                for name, delta in zip(COUNTERS, counts)
+            }, synchronize_session='evaluate')
+            if not updated:
+                if any(delta > 0 for delta in counts):
+                    session.add(CaregiverWeekFairness(caregiver_id=caregiver_id, week_start=start,
+                                                      **{name: max(delta, 0) for name, delta in zip(COUNTERS, counts)}))
+            elif any(delta < 0 for delta in counts):
+                week.filter(*(getattr(CaregiverWeekFairness, name) <= 0 for name in COUNTERS)).delete(
+                    synchronize_session='evaluate')
+
+class FairnessTable:
+    """Rolling-window fairness counters per caregiver, updated in memory as a generator assigns."""
+
+    def __init__(self, counts, hours, weeks):
+        self.counts = counts  # {caregiver_id: [nights, weekends, holidays]}
+        self.hours = hours    # {caregiver_id: hours worked in the window}
+        self.weeks = weeks
+
+    @classmethod
+    def load(cls, before, weeks=None):
+        """Sum the ``weeks`` full weeks ending before the week containing ``before``, rotation shifts included."""
+        weeks = weeks or current_app.config['FAIRNESS_WINDOW_WEEKS']
+        end = week_start(before)
+        start = end - timedelta(weeks=weeks)
+
+        counts = defaultdict(lambda: [0, 0, 0])
+        facility_id = current_facility_id()
+        rows = db.session.query(
+            CaregiverWeekFairness.caregiver_id,
+            func.sum(CaregiverWeekFairness.night_shifts),
+            func.sum(CaregiverWeekFairness.weekend_shifts),
+            func.sum(CaregiverWeekFairness.holiday_shifts)
+        ).join(Caregiver).filter(
+            Caregiver.facility_id == facility_id,
+            CaregiverWeekFairness.week_start >= start,
+            CaregiverWeekFairness.week_start < end
+        ).group_by(CaregiverWeekFairness.caregiver_id).all()
+        for caregiver_id, nights, weekends, holidays in rows:
+            counts[caregiver_id] = [nights or 0, weekends or 0, holidays or 0]
+
+        hours = dict(db.session.query(
+            CaregiverWeekHours.caregiver_id, func.sum(CaregiverWeekHours.hours)
+        ).join(Caregiver).filter(
+            Caregiver.facility_id == facility_id,
+            CaregiverWeekHours.week_start >= start,
+            CaregiverWeekHours.week_start < end
+        ).group_by(CaregiverWeekHours.caregiver_id).all())
+
+        # Rotation shifts are not stored, so count them on top as load_week_totals does
+        for shift in expand(start, end):
+            entry = counts[shift.caregiver_id]
+            for i, flag in enumerate(shift_flags(shift.date, shift.shift_type)):
+                entry[i] += flag
+            hours[shift.caregiver_id] = (hours.get(shift.caregiver_id) or 0) + shift.duration_hours
+
+        return cls(counts, hours, weeks)
+
+    def copy(self):
+        counts = defaultdict(lambda: [0, 0, 0], {cid: list(c) for cid, c in self.counts.items()})
+        return FairnessTable(counts, dict(self.hours), self.weeks)
+
+    def hours_debt(self, caregiver_id):
+        """Hours short of HOURS_PER_WEEK over the window (negative when over)."""
+        return self.weeks * ShiftConfig.HOURS_PER_WEEK - (self.hours.get(caregiver_id) or 0)
+
+    def cost(self, caregiver_id, date, shift_type):
+        """Lower is fairer: undesirable shifts already worked, minus weeks of hours owed."""
+        counts = self.counts[caregiver_id]
+        burden = sum(count * flag for count, flag in zip(counts, shift_flags(date, shift_type)))
+        return burden - self.hours_debt(caregiver_id) / ShiftConfig.HOURS_PER_WEEK
+
+    def record(self, caregiver_id, date, shift_type):
+        counts = self.counts[caregiver_id]
+        for i, flag in enumerate(shift_flags(date, shift_type)):
+            counts[i] += flag
+
+def fairness_report(as_of, weeks=None):
+    """Per-caregiver counters for the window ending with the week containing ``as_of``."""
+    table = FairnessTable.load(as_of + timedelta(weeks=1), weeks)
+    report = []
+    for caregiver in Caregiver.query.filter_by(facility_id=current_facility_id()).order_by(Caregiver.id).all():
+        nights, weekends, holidays = table.counts[caregiver.id]
+        report.append({
+            'caregiver_id': caregiver.id,
+            'name': caregiver.name,
+            'night_shifts': nights,
+            'weekend_shifts': weekends,
+            'holiday_shifts': holidays,
+            'hours': table.hours.get(caregiver.id) or 0,
+            'hours_debt': table.hours_debt(caregiver.id)
+        })
+    return {'weeks': table.weeks, 'through': week_start(as_of).isoformat(), 'caregivers': report}
+
+def rebuild_fairness():
+    """Recompute caregiver_week_fairness from the live and archived shift tables."""
+    try:
+        CaregiverWeekFairness.query.delete(synchronize_session=False)
+        rows = []
+        for table in (Shift, ShiftArchive):
+            rows += db.session.query(
+                table.caregiver_id, table.date, table.shift_type, func.count(table.id)
+            ).group_by(table.caregiver_id, table.date, table.shift_type).all()
+
+        totals = defaultdict(lambda: [0, 0, 0])
+        for caregiver_id, date, shift_type, count in rows:
+            entry = totals[(caregiver_id, week_start(date))]
+            for i, flag in enumerate(shift_flags(date, shift_type)):
+                entry[i] += count * flag
+
+        for (caregiver_id, start), (nights, weekends, holidays) in totals.items():
+            if nights or weekends or holidays:
+                db.session.add(CaregiverWeekFairness(
+                    caregiver_id=caregiver_id,
+                    week_start=start,
+                    night_shifts=nights,
+                    weekend_shifts=weekends,
+                    holiday_shifts=holidays
+                ))
+        db.session.commit()
+        logger.info(f"Rebuilt fairness counters for {len(totals)} caregiver weeks")
+        return len(totals)
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,355 @@
+from datetime import datetime, timedelta
+from collections import Counter
+from urllib import request as urlrequest
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from .models import db, Facility, Shift, DataVersion, GapAlert
+from .rotations import expand
+from .shift_types import get_registry
+from .events import bus
+from .facilities import use_facility
+import json
+import os
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _hour_ranges(hours):
+    """Merge [(datetime, short)] hour by hour into [{'start', 'end', 'short'}] runs."""
+    ranges = []
+    for hour, short in hours:
+        if ranges and ranges[-1]['end'] == hour and ranges[-1]['short'] == short:
+            ranges[-1]['end'] = hour + timedelta(hours=1)
+        else:
+            ranges.append({'start': hour, 'end': hour + timedelta(hours=1), 'short': short})
+    return [{'start': r['start'].isoformat(), 'end': r['end'].isoformat(), 'short': r['short']} for r in ranges]
+
+# Data versions the gap index depends on; shift type changes are seen through the registry
+TRACKED_VERSIONS = ('shift', 'rotation')
+
+def read_versions():
+    return dict(db.session.query(DataVersion.name, DataVersion.version).filter(
+        DataVersion.name.in_(TRACKED_VERSIONS)
+    ).all())
+
+def event_version(event):
+    """(version name, version) a bus event was written at, or None for events without one."""
+    versions = event.get('versions')
+    if not versions:
+        return None
+    if event['type'] == 'rotation_changed':
+        name = 'rotation'
+    elif event['type'] in ('shift_added', 'shift_removed'):
+        name = 'rotation' if str(event['shift']['id']).startswith('rotation-') else 'shift'
+    else:
+        return None
+    return name, versions.get(name, 0)
+
+class GapIndex:
+    """Required against filled headcount for one facility, per slot and per hour, over [start_date, end_date).
+
+    Stored and rotation shifts are counted separately and both fill a
+    slot. Hour ``h`` of day ``d`` (counted from ``start_date``) is
+    ``24 * d + h`` in the hourly arrays.
+    """
+
+    def __init__(self, facility_id, start_date, end_date, registry, stored=(), rotation=(), versions=None):
+        self.facility_id = facility_id
+        self.versions = versions or {}  # Data versions the counts include
+        self.start_date = start_date
+        self.end_date = end_date
+        self.registry = registry
+        self.stored = Counter(stored)
+        self.rotation = Counter(rotation)
+        # One extra day takes shifts running past midnight on the last date
+        hours = 24 * ((end_date - start_date).days + 1)
+        self.required = [0] * hours
+        self.covered = [0] * hours
+        self.slots = {}  # (date, shift_type) -> required headcount
+        for day in range((end_date - start_date).days):
+            date = start_date + timedelta(days=day)
+            for shift_type, count in registry.required(date.weekday()):
+                self.slots[(date, shift_type)] = count
+                self._add_hours(self.required, date, shift_type, count)
+        for slot in set(self.stored) | set(self.rotation):
+            self._add_hours(self.covered, *slot, self.filled(slot))
+
+    @classmethod
+    def load(cls, facility_id, start_date, end_date, attempts=3):
+        """Read the range, retrying while it changes underneath so ``versions`` matches the counts."""
+        # Shifts from the day before can run into start_date
+        begin = start_date - timedelta(days=1)
+        versions = read_versions()
+        for _ in range(attempts):
+            with use_facility(facility_id):
+                stored = db.session.query(Shift.date, Shift.shift_type, func.count()).filter(
+                    Shift.facility_id == facility_id,
+                    Shift.date >= begin,
+                    Shift.date < end_date
+                ).group_by(Shift.date, Shift.shift_type).all()
+                rotation = Counter((s.date, s.shift_type) for s in expand(begin, end_date))
+            before, versions = versions, read_versions()
+            if before == versions:
+                break
+        else:
+            # Still moving; events up to these versions may be counted twice until the next rebuild
+            logger.debug(f"Coverage gap index for facility {facility_id} loaded while data kept changing")
+        return cls(facility_id, start_date, end_date, get_registry(),
+                   {(date, shift_type): count for date, shift_type, count in stored}, rotation, versions)
+
+    def _add_hours(self, hours, date, shift_type, count):
+        base = 24 * (date - self.start_date).days
+        mask = self.registry.day_mask(shift_type)
+        while mask:
+            bit = mask & -mask
+            index = base + bit.bit_length() - 1
+            if 0 <= index < len(hours):
+                hours[index] += count
+            mask ^= bit
+
+    def filled(self, slot):
+        return self.stored[slot] + self.rotation[slot]
+
+    def apply(self, date, shift_type, delta, rotation=False):
+        """Count ``delta`` shifts added to (or removed from) a slot."""
+        if not self.start_date - timedelta(days=1) <= date < self.end_date:
+            return
+        slot = (date, shift_type)
+        before = self.filled(slot)
+        counts = self.rotation if rotation else self.stored
+        counts[slot] += delta
+        if counts[slot] <= 0:
+            del counts[slot]
+        change = self.filled(slot) - before
+        if change:
+            self._add_hours(self.covered, date, shift_type, change)
+
+    def _starts_at(self, date, shift_type):
+        return datetime.combine(date, datetime.min.time()) + timedelta(hours=self.registry.get(shift_type).start_hour)
+
+    def gaps(self, now):
+        """Understaffed slots that have not ended yet, most urgent (soonest, then most short) first."""
+        found = []
+        for (date, shift_type), required in self.slots.items():
+            missing = required - self.filled((date, shift_type))
+            if missing <= 0:
+                continue
+            definition = self.registry.get(shift_type)
+            starts = self._starts_at(date, shift_type)
+            if starts + timedelta(hours=definition.duration) <= now:
+                continue
+            found.append((starts, -missing, definition.code, date, required, missing))
+        found.sort()
+        return [
+            {
+                'date': date.isoformat(),
+                'shift_type': shift_type,
+                'starts_at': starts.isoformat(),
+                'hours_until': round((starts - now).total_seconds() / 3600, 1),
+                'required': required,
+                'filled': required - missing,
+                'missing': missing
+            }
+            for starts, _, shift_type, date, required, missing in found
+        ]
+
+    def short_hours(self, now):
+        """Runs of hours from ``now`` on with fewer caregivers on duty than the shift types require."""
+        start = datetime.combine(self.start_date, datetime.min.time())
+        first = max(0, int((now - start).total_seconds() // 3600))
+        last = 24 * (self.end_date - self.start_date).days
+        return _hour_ranges(
+            (start + timedelta(hours=i), self.required[i] - self.covered[i])
+            for i in range(first, last) if self.covered[i] < self.required[i]
+        )
+
+class GapMonitor:
+    """Coverage gaps over the next ``weeks`` weeks, kept per facility and updated from the event bus.
+
+    Shift events adjust an index in place, unless the index was loaded
+    at or after the data version the event was written at. Rotation
+    template changes, shift type changes, a new day or a full event
+    queue rebuild it. So does a change made by another process: every
+    local event carries the shift and rotation versions its flush wrote,
+    and a version that skips ahead of the last one seen, or a stored
+    version no local event accounts for, means someone else wrote in
+    between. Indexes are also rebuilt every ``resync_minutes``. With
+    alerts on, a background thread reports gaps starting within
+    ``lead_hours`` to the log and, if configured, a webhook.
+    """
+
+    def __init__(self, weeks=4, lead_hours=48, interval=60, resync_minutes=15):
+        self.alerts = False
+        self.weeks = weeks
+        self.lead_hours = lead_hours
+        self.interval = interval
+        self.resync_minutes = resync_minutes
+        self.webhook = None
+        self._app = None
+        self._indexes = {}
+        self._events = None
+        self._versions = None
+        self._synced_at = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self.weeks = app.config.get('GAP_HORIZON_WEEKS', self.weeks)
+        self.alerts = app.config.get('GAP_ALERTS', False)
+        self.lead_hours = app.config.get('GAP_ALERT_LEAD_HOURS', self.lead_hours)
+        self.interval = app.config.get('GAP_MONITOR_INTERVAL', self.interval)
+        self.webhook = app.config.get('GAP_ALERT_WEBHOOK') or None
+        if self.alerts:
+            app.before_request(self._ensure_worker)
+
+    def _apply_event(self, event):
+        """Apply one bus event; False if events from another process may have been missed."""
+        if event['type'] == 'resync':
+            return False
+        written = event_version(event)
+        if written is None:
+            return True
+        name, version = written
+        seen = self._versions.get(name) if self._versions is not None else None
+        # Events from one flush share a version, the next flush writes one more
+        in_step = seen is None or version in (seen, seen + 1)
+        if self._versions is not None:
+            self._versions[name] = max(version, seen or 0)
+
+        index = self._indexes.get(event['facility_id'])
+        if index is None or version <= index.versions.get(name, 0):
+            return in_step
+        if event['type'] == 'rotation_changed':
+            del self._indexes[event['facility_id']]
+        else:
+            shift = event['shift']
+            index.apply(datetime.strptime(shift['date'], '%Y-%m-%d').date(), shift['shift_type'],
+                        1 if event['type'] == 'shift_added' else -1, rotation=name == 'rotation')
+        return in_step
+
+    def _sync(self):
+        if self._events is None:
+            self._events = bus.subscribe()
+        in_step = True
+        while True:
+            try:
+                in_step &= self._apply_event(self._events.get_nowait())
+            except queue.Empty:
+                break
+        versions = read_versions()
+        stale = not in_step or (self._versions is not None and versions != self._versions)
+        if stale or time.monotonic() - self._synced_at > self.resync_minutes * 60:
+            self._indexes.clear()
+            self._synced_at = time.monotonic()
+        self._versions = versions
+
+    def index(self, facility_id):
+        """The up-to-date GapIndex for a facility, starting today."""
+        today = datetime.now().date()
+        with self._lock:
+            self._sync()
+            index = self._indexes.get(facility_id)
+            if index is None or index.start_date != today or index.registry is not get_registry():
+                started = time.perf_counter()
+                index = GapIndex.load(facility_id, today, today + timedelta(weeks=self.weeks))
+                self._indexes[facility_id] = index
+                logger.debug(f"Built coverage gap index for facility {facility_id} "
+                             f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+            return index
+
+    def report(self, facility_id, now=None, within_hours=None):
+        now = now or datetime.now()
+        index = self.index(facility_id)
+        gaps = index.gaps(now)
+        if within_hours is not None:
+            gaps = [gap for gap in gaps if gap['hours_until'] <= within_hours]
+        return {
+            'horizon_start': index.start_date.isoformat(),
+            'horizon_end': (index.end_date - timedelta(days=1)).isoformat(),
+            'gaps': gaps,
+            'short_hours': index.short_hours(now)
+        }
+
+    def check_alerts(self, now=None):
+        """Alert on gaps starting within the lead time; returns the alerts sent."""
+        now = now or datetime.now()
+        sent = []
+        for facility in Facility.query.order_by(Facility.id).all():
+            gaps = {(gap['date'], gap['shift_type']): gap for gap in self.index(facility.id).gaps(now)}
+            alerted = {(row.date.isoformat(), row.shift_type): row.missing
+                       for row in GapAlert.query.filter_by(facility_id=facility.id)}
+            # Forget filled or past gaps so the slot alerts again if it reopens
+            for date, shift_type in alerted.keys() - gaps.keys():
+                self._alerts(facility.id, date, shift_type).delete(synchronize_session=False)
+            db.session.commit()
+
+            for (date, shift_type), gap in gaps.items():
+                if gap['hours_until'] > self.lead_hours or alerted.get((date, shift_type), 0) >= gap['missing']:
+                    continue
+                # Conditional writes, so when several workers see the gap only one reports it
+                if (date, shift_type) in alerted:
+                    claimed = self._alerts(facility.id, date, shift_type).filter(
+                        GapAlert.missing < gap['missing']
+                    ).update({'missing': gap['missing']}, synchronize_session=False)
+                    db.session.commit()
+                else:
+                    try:
+                        db.session.add(GapAlert(facility_id=facility.id, shift_type=shift_type,
+                                                date=datetime.strptime(date, '%Y-%m-%d').date(),
+                                                missing=gap['missing']))
+                        db.session.commit()
+                        claimed = True
+                    except IntegrityError:
+                        db.session.rollback()
+                        claimed = False
+                if not claimed:
+                    continue
+                alert = dict(gap, facility_id=facility.id, facility=facility.name)
+                self._send(alert)
+                sent.append(alert)
+        return sent
+
+    @staticmethod
+    def _alerts(facility_id, date, shift_type):
+        return GapAlert.query.filter_by(facility_id=facility_id, shift_type=shift_type,
+                                        date=datetime.strptime(date, '%Y-%m-%d').date())
+
+    def _send(self, alert):
+        logger.warning(f"Coverage gap at {alert['facility']}: {alert['missing']} short on "
+                       f"{alert['shift_type']} {alert['date']} (starts in {alert['hours_until']}h)")
+        if not self.webhook:
+            return
+        try:
+            req = urlrequest.Request(self.webhook, data=json.dumps(alert).encode(),
+                                     headers={'Content-Type': 'application/json'})
+            urlrequest.urlopen(req, timeout=5).close()
+        except Exception as e:
+            logger.error(f"Gap alert webhook failed: {e}")
+
+    def _ensure_worker(self):
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name='gap-monitor', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            # A fresh context per check, so data versions cached in g are not carried over
+            with self._app.app_context():
+                try:
+                    self.check_alerts()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Gap monitor check failed: {e}")
+                finally:
+                    db.session.remove()
+            time.sleep(self.interval)
+
+gap_monitor = GapMonitor()
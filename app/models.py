@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from .config import ShiftConfig
+from datetime import datetime
 import logging
 
 # Configure logging
@@ -8,27 +8,238 @@ logger = logging.getLogger(__name__)
 
 from . import db
 
+class Facility(db.Model):
+    """A care home; caregivers, shifts and rotations each belong to one."""
+    __tablename__ = 'facility'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
 class Caregiver(db.Model):
     __tablename__ = 'caregiver'
     id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     shifts = db.relationship('Shift', backref='caregiver', lazy=True)
+    availability = db.relationship('CaregiverAvailability', backref='caregiver', lazy=True,
+                                   cascade='all, delete-orphan')
+    time_off = db.relationship('CaregiverTimeOff', backref='caregiver', lazy=True,
+                               cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_caregiver_facility', 'facility_id', 'id'),
+    )
 
 class Shift(db.Model):
     __tablename__ = 'shift'
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False)  # Copied from the caregiver
+    date = db.Column(db.Date, nullable=False, index=True)
     shift_type = db.Column(db.String(3), nullable=False)  # A, B, C, G1, or G2
     caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
 
+    __table_args__ = (
+        # Slot lookups: who covers (date, shift_type) in this facility
+        db.Index('ix_shift_facility_slot', 'facility_id', 'date', 'shift_type'),
+    )
+
+    @property
+    def definition(self):
+        from .shift_types import get_registry
+        return get_registry().get(self.shift_type)
+
     @property
     def time_range(self):
-        return ShiftConfig.SHIFTS[self.shift_type]['time']
+        return self.definition.time
     
     @property
     def start_hour(self):
-        return ShiftConfig.SHIFTS[self.shift_type]['start_hour']
+        return self.definition.start_hour
     
     @property
     def duration_hours(self):
-        return ShiftConfig.SHIFTS[self.shift_type]['duration'] 
\ No newline at end of file
+        return self.definition.duration 
+
+class ShiftArchive(db.Model):
+    """Cold storage for shifts older than the retention horizon."""
+    __tablename__ = 'shift_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    original_shift_id = db.Column(db.Integer)  # SQLite reuses shift ids, so they are not unique here
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    shift_type = db.Column(db.String(3), nullable=False)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_shift_archive_facility_date', 'facility_id', 'date'),
+    )
+
+class ShiftRollup(db.Model):
+    """Per-caregiver hour totals for a week or month, recorded before archival."""
+    __tablename__ = 'shift_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
+    period = db.Column(db.String(5), nullable=False)  # 'week' or 'month'
+    period_start = db.Column(db.Date, nullable=False)
+    shift_count = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('caregiver_id', 'period', 'period_start', name='uq_shift_rollup_period'),
+    )
+
+
+class CaregiverWeekHours(db.Model):
+    """Shift and hour totals per caregiver per week, kept in step with the shift table."""
+    __tablename__ = 'caregiver_week_hours'
+    id = db.Column(db.Integer, primary_key=True)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)  # Monday
+    shift_count = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('week_start', 'caregiver_id', name='uq_caregiver_week_hours'),
+    )
+
+
+class CaregiverAvailability(db.Model):
+    """A recurring weekly window a caregiver can (or prefers to) work.
+
+    A caregiver with no windows is treated as available at all hours.
+    """
+    __tablename__ = 'caregiver_availability'
+    id = db.Column(db.Integer, primary_key=True)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    start_hour = db.Column(db.Integer, nullable=False)
+    end_hour = db.Column(db.Integer, nullable=False)  # Exclusive, up to 24
+    preferred = db.Column(db.Boolean, nullable=False, default=False)
+
+class CaregiverTimeOff(db.Model):
+    """A dated exception blocking some or all hours of one day."""
+    __tablename__ = 'caregiver_time_off'
+    id = db.Column(db.Integer, primary_key=True)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    start_hour = db.Column(db.Integer, nullable=False, default=0)
+    end_hour = db.Column(db.Integer, nullable=False, default=24)
+    reason = db.Column(db.String(200))
+
+    __table_args__ = (
+        db.Index('ix_caregiver_time_off_date', 'date', 'caregiver_id'),
+    )
+
+
+class ShiftType(db.Model):
+    """Definition of a shift: its hours, display color and required staffing per weekday."""
+    __tablename__ = 'shift_type'
+    code = db.Column(db.String(3), primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    start_hour = db.Column(db.Integer, nullable=False)
+    duration = db.Column(db.Integer, nullable=False)
+    color = db.Column(db.String(7), nullable=False)
+    headcount = db.Column(db.String(20), nullable=False, default='1,1,1,1,1,1,1')  # Monday..Sunday
+    sort_order = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    """Monotonic change counter per table, used to key cached fragments."""
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+
+class ScheduleChange(db.Model):
+    """Append-only log of shift and caregiver changes; version orders all writes."""
+    __tablename__ = 'schedule_change'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'))
+    entity = db.Column(db.String(20), nullable=False)  # 'shift', 'caregiver' or 'rotation'
+    entity_id = db.Column(db.String(40), nullable=False)  # Rotation shifts use their 'rotation-<entry>-<date>' id
+    action = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_schedule_change_entity', 'entity', 'entity_id'),
+        db.Index('ix_schedule_change_facility', 'facility_id', 'version'),
+    )
+
+
+class CaregiverWeekFairness(db.Model):
+    """Night, weekend and holiday shift counts per caregiver per week, kept in step with the shift table."""
+    __tablename__ = 'caregiver_week_fairness'
+    id = db.Column(db.Integer, primary_key=True)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)  # Monday
+    night_shifts = db.Column(db.Integer, nullable=False, default=0)
+    weekend_shifts = db.Column(db.Integer, nullable=False, default=0)
+    holiday_shifts = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('week_start', 'caregiver_id', name='uq_caregiver_week_fairness'),
+    )
+
+
+class RotationTemplate(db.Model):
+    """A repeating pattern of shifts, expanded on read instead of stored per date.
+
+    The pattern is ``cycle_weeks`` long and starts on ``start_date`` (a
+    Monday). An occurrence is cancelled, or replaced by a Shift row, through
+    a RotationSkip.
+    """
+    __tablename__ = 'rotation_template'
+    id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    cycle_weeks = db.Column(db.Integer, nullable=False, default=1)
+    until = db.Column(db.Date)  # Last date covered; open-ended if null
+    entries = db.relationship('RotationEntry', backref='template', lazy=True,
+                              cascade='all, delete-orphan')
+    skips = db.relationship('RotationSkip', backref='template', lazy=True,
+                            cascade='all, delete-orphan')
+
+class RotationEntry(db.Model):
+    """One shift in a rotation: which week of the cycle, weekday, shift type and caregiver."""
+    __tablename__ = 'rotation_entry'
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('rotation_template.id'), nullable=False, index=True)
+    week = db.Column(db.Integer, nullable=False, default=0)  # 0-based week within the cycle
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    shift_type = db.Column(db.String(3), nullable=False)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregiver.id'), nullable=False, index=True)
+
+class RotationSkip(db.Model):
+    """A cancelled occurrence of a rotation entry."""
+    __tablename__ = 'rotation_skip'
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('rotation_template.id'), nullable=False)
+    entry_id = db.Column(db.Integer, db.ForeignKey('rotation_entry.id', ondelete='CASCADE'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    entry = db.relationship('RotationEntry')
+
+    __table_args__ = (
+        db.UniqueConstraint('entry_id', 'date', name='uq_rotation_skip'),
+        db.Index('ix_rotation_skip_date', 'date'),
+    )
+
+
+class PayrollPeriod(db.Model):
+    """Cached payroll lines for a closed pay period; dropped when a shift inside it changes."""
+    __tablename__ = 'payroll_period'
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    period_end = db.Column(db.Date, nullable=False)  # Exclusive
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lines = db.Column(db.Text, nullable=False)  # JSON {caregiver_id: {...}}
+
+class GapAlert(db.Model):
+    """An understaffed slot already reported, so each gap is alerted once across workers."""
+    __tablename__ = 'gap_alert'
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    shift_type = db.Column(db.String(3), primary_key=True)
+    missing = db.Column(db.Integer, nullable=False)
+    alerted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,248 @@
+from datetime import timedelta
+from .models import db, Shift, Caregiver
+from .availability import AvailabilityIndex
+from .conflicts import OccupancyIndex
+from .fairness import FairnessTable, shift_flags
+from .rotations import expand
+from .facilities import current_facility_id
+from .shift_types import get_registry
+from .config import ShiftConfig
+import math
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Objective weights (lower objective is better)
+HOURS_WEIGHT = 1.0       # per squared hour away from HOURS_PER_WEEK, scaled by HOURS_PER_SHIFT
+FAIRNESS_WEIGHT = 0.5    # per squared night/weekend/holiday count over the fairness window
+PREFERENCE_BONUS = 2.0   # per shift given to a caregiver who prefers it
+CHANGE_PENALTY = 0.25    # per shift moved off its stored caregiver, so ties don't churn the schedule
+
+class WeekState:
+    """One week's assignments plus the delta tables the local search scores moves against.
+
+    ``totals`` is the per-caregiver table (shifts, hours, nights, weekends,
+    holidays) and ``slot_costs`` the per-slot table of what each caregiver
+    costs in that slot (None where they are unavailable). A move only
+    touches the rows of the caregivers it involves.
+    """
+
+    def __init__(self, start_date, shifts, caregiver_ids, availability, occupancy, fairness, fixed=()):
+        registry = get_registry()
+        self.start_date = start_date
+        self.shift_ids = [s.id for s in shifts]
+        self.slots = [(s.date, s.shift_type) for s in shifts]
+        self.assigned = [s.caregiver_id for s in shifts]
+        self.original = list(self.assigned)
+        self.caregiver_ids = list(caregiver_ids)
+        self.occupancy = occupancy
+        self.prior = {cid: fairness.counts[cid] for cid in self.caregiver_ids}
+
+        self.vectors = [(1, registry.hours_for(shift_type), *shift_flags(date, shift_type))
+                        for date, shift_type in self.slots]
+        self.slot_costs = []
+        for (date, shift_type), original in zip(self.slots, self.original):
+            costs = {}
+            for cid in self.caregiver_ids:
+                if availability.can_work(cid, date, shift_type):
+                    costs[cid] = -PREFERENCE_BONUS if availability.prefers(cid, date, shift_type) else 0.0
+                    if cid != original:
+                        costs[cid] += CHANGE_PENALTY
+                else:
+                    costs[cid] = None
+            self.slot_costs.append(costs)
+
+        # Rotation shifts count toward the totals but are not moved
+        self.totals = {cid: (0, 0, 0, 0, 0) for cid in self.caregiver_ids}
+        for shift in fixed:
+            vector = (1, registry.hours_for(shift.shift_type), *shift_flags(shift.date, shift.shift_type))
+            self.totals[shift.caregiver_id] = _plus(self.totals.get(shift.caregiver_id, (0, 0, 0, 0, 0)), vector)
+        for index, cid in enumerate(self.assigned):
+            self.totals[cid] = _plus(self.totals.get(cid, (0, 0, 0, 0, 0)), self.vectors[index])
+
+    @classmethod
+    def load(cls, start_date):
+        end_date = start_date + timedelta(days=7)
+        facility_id = current_facility_id()
+        shifts = Shift.query.filter(
+            Shift.facility_id == facility_id, Shift.date >= start_date, Shift.date < end_date
+        ).order_by(Shift.date, Shift.shift_type, Shift.id).all()
+        caregiver_ids = [cid for (cid,) in db.session.query(Caregiver.id).filter(
+            Caregiver.facility_id == facility_id
+        ).order_by(Caregiver.id)]
+        return cls(
+            start_date,
+            shifts,
+            caregiver_ids,
+            AvailabilityIndex.load(start_date, end_date),
+            OccupancyIndex.load(start_date, end_date),
+            FairnessTable.load(start_date),
+            expand(start_date, end_date)
+        )
+
+    def caregiver_cost(self, cid, totals):
+        shifts, hours, nights, weekends, holidays = totals
+        prior = self.prior.get(cid, (0, 0, 0))
+        cost = HOURS_WEIGHT * (hours - ShiftConfig.HOURS_PER_WEEK) ** 2 / ShiftConfig.HOURS_PER_SHIFT
+        cost += FAIRNESS_WEIGHT * ((prior[0] + nights) ** 2 + (prior[1] + weekends) ** 2 + (prior[2] + holidays) ** 2)
+        return cost
+
+    def slot_cost(self, index, cid):
+        cost = self.slot_costs[index].get(cid)
+        # Keep existing assignments of caregivers the tables know nothing about
+        return 0.0 if cost is None and cid == self.original[index] else cost
+
+    def objective(self):
+        total = sum(self.caregiver_cost(cid, totals) for cid, totals in self.totals.items())
+        return total + sum(self.slot_cost(i, cid) or 0.0 for i, cid in enumerate(self.assigned))
+
+    def _feasible(self, cid, index, totals):
+        """Hard rules for giving slot ``index`` to ``cid`` (its previous holder already removed)."""
+        if totals[0] > ShiftConfig.SHIFTS_PER_WEEK or self.slot_cost(index, cid) is None:
+            return False
+        date, shift_type = self.slots[index]
+        occupancy = self.occupancy
+        if occupancy.day_counts.get((cid, occupancy._offset(date))):
+            return False
+        return occupancy.can_assign(cid, date, shift_type)
+
+    def try_move(self, index, cid):
+        """Delta for reassigning one shift to ``cid``, or None if illegal."""
+        old = self.assigned[index]
+        if old == cid:
+            return None
+        vector = self.vectors[index]
+        old_totals, new_totals = self.totals[old], self.totals.get(cid, (0, 0, 0, 0, 0))
+        old_after, new_after = _minus(old_totals, vector), _plus(new_totals, vector)
+
+        date, shift_type = self.slots[index]
+        self.occupancy.remove(old, date, shift_type)
+        legal = self._feasible(cid, index, new_after)
+        self.occupancy.add(old, date, shift_type)
+        if not legal:
+            return None
+
+        return (self.caregiver_cost(old, old_after) - self.caregiver_cost(old, old_totals)
+                + self.caregiver_cost(cid, new_after) - self.caregiver_cost(cid, new_totals)
+                + self.slot_cost(index, cid) - (self.slot_cost(index, old) or 0.0))
+
+    def try_swap(self, i, j):
+        """Delta for exchanging the caregivers of two shifts, or None if illegal."""
+        a, b = self.assigned[i], self.assigned[j]
+        if a == b:
+            return None
+        vi, vj = self.vectors[i], self.vectors[j]
+        a_totals, b_totals = self.totals[a], self.totals[b]
+        a_after = _plus(_minus(a_totals, vi), vj)
+        b_after = _plus(_minus(b_totals, vj), vi)
+
+        (di, ti), (dj, tj) = self.slots[i], self.slots[j]
+        self.occupancy.remove(a, di, ti)
+        self.occupancy.remove(b, dj, tj)
+        legal = self._feasible(a, j, a_after) and self._feasible(b, i, b_after)
+        self.occupancy.add(a, di, ti)
+        self.occupancy.add(b, dj, tj)
+        if not legal:
+            return None
+
+        return (self.caregiver_cost(a, a_after) - self.caregiver_cost(a, a_totals)
+                + self.caregiver_cost(b, b_after) - self.caregiver_cost(b, b_totals)
+                + self.slot_cost(j, a) + self.slot_cost(i, b)
+                - (self.slot_cost(i, a) or 0.0) - (self.slot_cost(j, b) or 0.0))
+
+    def apply_move(self, index, cid):
+        old = self.assigned[index]
+        date, shift_type = self.slots[index]
+        self.occupancy.remove(old, date, shift_type)
+        self.occupancy.add(cid, date, shift_type)
+        self.totals[old] = _minus(self.totals[old], self.vectors[index])
+        self.totals[cid] = _plus(self.totals.get(cid, (0, 0, 0, 0, 0)), self.vectors[index])
+        self.assigned[index] = cid
+
+    def apply_swap(self, i, j):
+        a, b = self.assigned[i], self.assigned[j]
+        self.apply_move(i, b)
+        self.apply_move(j, a)
+
+def _plus(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+def _minus(a, b):
+    return tuple(x - y for x, y in zip(a, b))
+
+def anneal(state, budget_seconds, seed=None, start_temperature=5.0, end_temperature=0.05):
+    """Simulated annealing over move/swap neighbourhoods until the time budget runs out.
+
+    Returns (best assignment, stats). The temperature cools geometrically
+    with elapsed time, so the schedule is the same shape for any budget.
+    """
+    rng = random.Random(seed)
+    slots = len(state.slots)
+    current = best = state.objective()
+    best_assigned = list(state.assigned)
+    history = [(0.0, round(current, 3))]
+    iterations = accepted = 0
+    if slots < 2 or len(state.caregiver_ids) < 2:
+        return best_assigned, {'initial': history[0][1], 'best': history[0][1], 'iterations': 0,
+                               'accepted': 0, 'elapsed': 0.0, 'history': history}
+
+    started = time.perf_counter()
+    deadline = started + budget_seconds
+    ratio = end_temperature / start_temperature
+    now = started
+    while now < deadline:
+        iterations += 1
+        if rng.random() < 0.5:
+            i = rng.randrange(slots)
+            cid = rng.choice(state.caregiver_ids)
+            delta = state.try_move(i, cid)
+            move = (state.apply_move, i, cid)
+        else:
+            i, j = rng.randrange(slots), rng.randrange(slots)
+            delta = state.try_swap(i, j)
+            move = (state.apply_swap, i, j)
+
+        if delta is not None:
+            temperature = start_temperature * ratio ** ((now - started) / budget_seconds)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                move[0](move[1], move[2])
+                accepted += 1
+                current += delta
+                if current < best - 1e-9:
+                    best = current
+                    best_assigned = list(state.assigned)
+                    history.append((round(time.perf_counter() - started, 4), round(best, 3)))
+        if iterations % 64 == 0:
+            now = time.perf_counter()
+
+    elapsed = time.perf_counter() - started
+    history.append((round(elapsed, 4), round(best, 3)))
+    return best_assigned, {
+        'initial': history[0][1],
+        'best': round(best, 3),
+        'iterations': iterations,
+        'accepted': accepted,
+        'elapsed': round(elapsed, 4),
+        'history': history
+    }
+
+def polish_week(start_date, budget_seconds=1.0, seed=None):
+    """Improve the stored schedule for the week starting ``start_date`` in place."""
+    state = WeekState.load(start_date)
+    best_assigned, stats = anneal(state, budget_seconds, seed)
+
+    changed = {state.shift_ids[i]: cid for i, cid in enumerate(best_assigned) if cid != state.original[i]}
+    try:
+        if changed:
+            for shift in Shift.query.filter(Shift.id.in_(changed)).all():
+                shift.caregiver_id = changed[shift.id]
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    stats['reassigned'] = len(changed)
+    logger.info(f"Polished week of {start_date}: objective {stats['initial']} -> {stats['best']} "
+                f"after {stats['iterations']} iterations, {len(changed)} shifts reassigned")
+    return stats
@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event, func, case, cast, inspect, select, union_all, Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import db, Shift, ShiftArchive, ShiftType, Caregiver, PayrollPeriod, RotationTemplate, RotationEntry, RotationSkip
+from .aggregates import shift_changes
+from .fairness import shift_flags
+from .rotations import expand
+from .shift_types import get_registry
+from .config import ShiftConfig
+from .facilities import current_facility_id
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('shifts', 'hours', 'regular_hours', 'overtime_hours', 'night_hours', 'weekend_hours', 'holiday_hours')
+
+def pay_period(date):
+    """(start, end) of the pay period containing ``date``; ``end`` is exclusive."""
+    anchor = datetime.strptime(current_app.config['PAY_PERIOD_ANCHOR'], '%Y-%m-%d').date()
+    anchor -= timedelta(days=anchor.weekday())
+    length = 7 * current_app.config['PAY_PERIOD_WEEKS']
+    start = anchor + timedelta(days=(date - anchor).days // length * length)
+    return start, start + timedelta(days=length)
+
+def _days_since(column, start):
+    if db.engine.dialect.name == 'sqlite':
+        return cast(func.julianday(column) - func.julianday(start.isoformat()), Integer)
+    return cast(column - start, Integer)
+
+def _shift_rows(model, start, end, facility_id):
+    day = _days_since(model.date, start)
+    return select(
+        model.caregiver_id.label('caregiver_id'),
+        model.date.label('date'),
+        model.shift_type.label('shift_type'),
+        # Subtracting the remainder keeps the division exact however the database divides
+        cast((day - day % 7) / 7, Integer).label('week'),
+        (day % 7).label('weekday')  # start is a Monday
+    ).where(model.facility_id == facility_id, model.date >= start, model.date < end)
+
+def stored_week_totals(start, end):
+    """{(caregiver_id, week): [shifts, hours, night, weekend, holiday hours]} for live and archived shifts.
+
+    One GROUP BY over both tables; ``week`` counts from ``start`` (a Monday).
+    """
+    facility_id = current_facility_id()
+    shifts = union_all(_shift_rows(Shift, start, end, facility_id),
+                       _shift_rows(ShiftArchive, start, end, facility_id)).subquery()
+    hours = func.coalesce(ShiftType.duration, ShiftConfig.HOURS_PER_SHIFT)
+    night_codes = [d.code for d in get_registry() if d.night]
+    holidays = [datetime.strptime(d, '%Y-%m-%d').date() for d in sorted(ShiftConfig.HOLIDAYS)]
+
+    def hours_where(condition):
+        return func.sum(case((condition, hours), else_=0))
+
+    rows = db.session.query(
+        shifts.c.caregiver_id,
+        shifts.c.week,
+        func.count(),
+        func.sum(hours),
+        hours_where(shifts.c.shift_type.in_(night_codes)),
+        hours_where(shifts.c.weekday >= 5),
+        hours_where(shifts.c.date.in_(holidays))
+    ).select_from(shifts).outerjoin(
+        ShiftType, ShiftType.code == shifts.c.shift_type
+    ).group_by(shifts.c.caregiver_id, shifts.c.week).all()
+    return {(cid, week): [int(v or 0) for v in values] for cid, week, *values in rows}
+
+def compute_payroll(start, end):
+    """{caregiver_id: line} for [start, end), including rotation shifts.
+
+    Overtime is counted per week, beyond HOURS_PER_WEEK.
+    """
+    weeks = stored_week_totals(start, end)
+    registry = get_registry()
+    for shift in expand(start, end):
+        hours = registry.hours_for(shift.shift_type)
+        entry = weeks.setdefault((shift.caregiver_id, (shift.date - start).days // 7), [0, 0, 0, 0, 0])
+        entry[0] += 1
+        entry[1] += hours
+        for i, flag in enumerate(shift_flags(shift.date, shift.shift_type)):
+            entry[2 + i] += flag * hours
+
+    lines = defaultdict(lambda: dict.fromkeys(COLUMNS, 0))
+    weekly = defaultdict(lambda: [0] * ((end - start).days // 7))
+    for (caregiver_id, week), (shifts, hours, night, weekend, holiday) in weeks.items():
+        overtime = max(0, hours - ShiftConfig.HOURS_PER_WEEK)
+        line = lines[caregiver_id]
+        line['shifts'] += shifts
+        line['hours'] += hours
+        line['regular_hours'] += hours - overtime
+        line['overtime_hours'] += overtime
+        line['night_hours'] += night
+        line['weekend_hours'] += weekend
+        line['holiday_hours'] += holiday
+        weekly[caregiver_id][week] = hours
+    for caregiver_id, line in lines.items():
+        line['weekly_hours'] = weekly[caregiver_id]
+    return dict(lines)
+
+def payroll_report(date=None):
+    """Payroll for the current facility over the pay period containing ``date`` (default today).
+
+    Closed periods (ended on or before today) are served from payroll_period
+    once computed; the open period is always computed fresh.
+    """
+    today = datetime.now().date()
+    facility_id = current_facility_id()
+    start, end = pay_period(date or today)
+    closed = end <= today
+
+    cached = db.session.get(PayrollPeriod, (facility_id, start)) if closed else None
+    if cached is not None and cached.period_end == end:
+        lines = {int(cid): line for cid, line in json.loads(cached.lines).items()}
+    else:
+        cached = None
+        lines = compute_payroll(start, end)
+        if closed:
+            try:
+                db.session.merge(PayrollPeriod(facility_id=facility_id, period_start=start, period_end=end,
+                                               lines=json.dumps(lines)))
+                db.session.commit()
+            except IntegrityError:
+                # Another worker cached it first
+                db.session.rollback()
+
+    names = {c.id: c.name for c in Caregiver.query.filter_by(facility_id=facility_id).all()}
+    empty = dict.fromkeys(COLUMNS, 0)
+    report = []
+    for caregiver_id in sorted(set(names) | set(lines)):
+        line = lines.get(caregiver_id, dict(empty, weekly_hours=[0] * ((end - start).days // 7)))
+        report.append({'caregiver_id': caregiver_id, 'name': names.get(caregiver_id), **line})
+
+    return {
+        'period_start': start.isoformat(),
+        'period_end': (end - timedelta(days=1)).isoformat(),
+        'closed': closed,
+        'cached': cached is not None,
+        'caregivers': report,
+        'totals': {column: sum(line[column] for line in report) for column in COLUMNS}
+    }
+
+def payroll_csv(report):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['caregiver_id', 'name', 'period_start', 'period_end', *COLUMNS])
+    for line in report['caregivers']:
+        writer.writerow([line['caregiver_id'], line['name'], report['period_start'], report['period_end'],
+                         *(line[column] for column in COLUMNS)])
+    return output.getvalue()
+
+def clear_payroll_cache():
+    removed = PayrollPeriod.query.delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def _earliest_change(session):
+    """Earliest date whose payroll this flush can change, or None."""
+    dates = [date for _, (_, date, _) in shift_changes(session) if date is not None]
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ShiftType):
+            # Durations and night windows apply to every period
+            if obj not in session.dirty or {'duration', 'start_hour'} & set(inspect(obj).committed_state):
+                return datetime.min.date()
+        elif isinstance(obj, RotationSkip):
+            dates.append(obj.date)
+        elif isinstance(obj, RotationTemplate):
+            # Old and new start dates, in case it moved
+            dates.extend(d for d in inspect(obj).attrs.start_date.history.sum() if d)
+        elif isinstance(obj, RotationEntry) and obj.template is not None:
+            dates.append(obj.template.start_date)
+    return min(dates) if dates else None
+
+@event.listens_for(Session, 'before_flush')
+def _invalidate_payroll(session, flush_context, instances):
+    with session.no_autoflush:
+        earliest = _earliest_change(session)
+        # Only closed periods are cached, and they all end on or before today
+        if earliest is None or earliest >= datetime.now().date():
+            return
+        session.query(PayrollPeriod).filter(
+            PayrollPeriod.period_end > earliest
+        ).delete(synchronize_session=False)
@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from collections import defaultdict
+from sqlalchemy import func, literal
+from .models import (db, Caregiver, Shift, ShiftArchive, ShiftRollup, CaregiverWeekHours,
+                     RotationTemplate, RotationEntry, RotationSkip)
+from .shift_types import get_registry
+from .facilities import current_facility_id
+from .rotations import expand, entry_dates
+from .fairness import shift_flags, apply_fairness_deltas
+from .aggregates import week_start
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('week', 'month')
+
+def period_start(date, period):
+    if period == 'week':
+        return date - timedelta(days=date.weekday())
+    return date.replace(day=1)
+
+def next_period_start(date, period):
+    if period == 'week':
+        return period_start(date, period) + timedelta(weeks=1)
+    return period_start(date, period) + relativedelta(months=1)
+
+def retention_cutoff(weeks, today=None):
+    # Align the cutoff to a Monday so whole weeks are archived together
+    today = today or datetime.now().date()
+    monday = today - timedelta(days=today.weekday())
+    return monday - timedelta(weeks=weeks)
+
+def live_totals(start_date=None, end_date=None, facility_id=None):
+    """Aggregate live shifts into {(caregiver_id, period, period_start): [shifts, hours]}."""
+    query = db.session.query(
+        Shift.caregiver_id, Shift.date, Shift.shift_type, func.count(Shift.id)
+    )
+    if facility_id is not None:
+        query = query.filter(Shift.facility_id == facility_id)
+    if start_date:
+        query = query.filter(Shift.date >= start_date)
+    if end_date:
+        query = query.filter(Shift.date < end_date)
+    rows = query.group_by(Shift.caregiver_id, Shift.date, Shift.shift_type).all()
+
+    totals = defaultdict(lambda: [0, 0])
+    for caregiver_id, date, shift_type, count in rows:
+        add_to_totals(totals, caregiver_id, date, count, count * get_registry().hours_for(shift_type))
+    return totals
+
+def add_to_totals(totals, caregiver_id, date, shifts, hours):
+    for period in PERIODS:
+        entry = totals[(caregiver_id, period, period_start(date, period))]
+        entry[0] += shifts
+        entry[1] += hours
+
+def rotation_horizon(template, cutoff):
+    """The last cycle start of ``template`` on or before ``cutoff``.
+
+    Occurrences before it can be archived; moving start_date there keeps
+    every later date where it was.
+    """
+    cycle = timedelta(weeks=template.cycle_weeks)
+    return template.start_date + cycle * ((cutoff - template.start_date) // cycle)
+
+def expired_rotation_shifts(cutoff):
+    """[(template, horizon, [(caregiver_id, date, shift_type)])] for rotation shifts that can be archived."""
+    expired = []
+    for template in RotationTemplate.query.filter(RotationTemplate.start_date < cutoff).all():
+        horizon = rotation_horizon(template, cutoff)
+        if horizon <= template.start_date:
+            continue
+        skipped = set(db.session.query(RotationSkip.entry_id, RotationSkip.date).filter(
+            RotationSkip.template_id == template.id, RotationSkip.date < horizon
+        ))
+        shifts = [
+            (entry.caregiver_id, date, entry.shift_type)
+            for entry in RotationEntry.query.filter_by(template_id=template.id).order_by(RotationEntry.id)
+            for date in entry_dates(template, entry, template.start_date, horizon)
+            if (entry.id, date) not in skipped
+        ]
+        expired.append((template, horizon, shifts))
+    return expired
+
+def archive_shifts(weeks=None):
+    """Roll up and move shifts older than the retention horizon to shift_archive.
+
+    Rollups are merged into existing rows, so months that straddle the cutoff
+    accumulate correctly across runs. Rotation shifts in whole cycles before
+    the cutoff are archived too, and their templates start after them.
+    Everything happens in one transaction.
+    """
+    if weeks is None:
+        from flask import current_app
+        weeks = current_app.config['RETENTION_WEEKS']
+    cutoff = retention_cutoff(weeks)
+    logger.debug(f"Archiving shifts before {cutoff}")
+
+    totals = live_totals(end_date=cutoff)
+    rotations = expired_rotation_shifts(cutoff)
+    for _, _, shifts in rotations:
+        for caregiver_id, date, shift_type in shifts:
+            add_to_totals(totals, caregiver_id, date, 1, get_registry().hours_for(shift_type))
+    if not totals:
+        logger.debug("No shifts to archive")
+        return 0
+
+    try:
+        existing = {
+            (r.caregiver_id, r.period, r.period_start): r
+            for r in ShiftRollup.query.filter(
+                ShiftRollup.period_start >= min(key[2] for key in totals),
+                ShiftRollup.period_start <= cutoff
+            ).all()
+        }
+        for key, (shift_count, hours) in totals.items():
+            rollup = existing.get(key)
+            if rollup:
+                rollup.shift_count += shift_count
+                rollup.hours += hours
+            else:
+                caregiver_id, period, start = key
+                db.session.add(ShiftRollup(
+                    caregiver_id=caregiver_id,
+                    period=period,
+                    period_start=start,
+                    shift_count=shift_count,
+                    hours=hours
+                ))
+        db.session.flush()
+
+        old_shifts = db.session.query(
+            Shift.id, Shift.facility_id, Shift.date, Shift.shift_type, Shift.caregiver_id, literal(datetime.utcnow())
+        ).filter(Shift.date < cutoff)
+        db.session.execute(ShiftArchive.__table__.insert().from_select(
+            ['original_shift_id', 'facility_id', 'date', 'shift_type', 'caregiver_id', 'archived_at'], old_shifts
+        ))
+        # The bulk delete skips the session hooks: archiving writes no schedule_change rows
+        moved = Shift.query.filter(Shift.date < cutoff).delete(synchronize_session=False)
+        moved += archive_rotation_shifts(rotations)
+        # Archived weeks are covered by the rollups. Fairness counters have no
+        # rollup and are kept; rebuild_fairness reads shift_archive for them.
+        CaregiverWeekHours.query.filter(CaregiverWeekHours.week_start < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Archived {moved} shifts older than {cutoff}")
+        return moved
+    except Exception:
+        db.session.rollback()
+        raise
+
+def archive_rotation_shifts(rotations):
+    """Move the expired_rotation_shifts() output to shift_archive; returns the number moved.
+
+    Rotation shifts never had fairness rows, so archived ones are counted
+    there now, as if they had been stored.
+    """
+    rows, fairness = [], defaultdict(lambda: [0, 0, 0])
+    archived_at = datetime.utcnow()
+    for template, horizon, shifts in rotations:
+        for caregiver_id, date, shift_type in shifts:
+            rows.append({'facility_id': template.facility_id, 'date': date, 'shift_type': shift_type,
+                         'caregiver_id': caregiver_id, 'archived_at': archived_at})
+            entry = fairness[(caregiver_id, week_start(date))]
+            for i, flag in enumerate(shift_flags(date, shift_type)):
+                entry[i] += flag
+        RotationSkip.query.filter(RotationSkip.template_id == template.id,
+                                  RotationSkip.date < horizon).delete(synchronize_session=False)
+        template.start_date = horizon
+    if rows:
+        db.session.execute(ShiftArchive.__table__.insert(), rows)
+    apply_fairness_deltas(db.session, fairness)
+    return len(rows)
+
+def get_hours_history(period, start_date, end_date, caregiver_id=None):
+    """Hours per caregiver of the current facility per period, combining rollups with live shifts.
+
+    Archived ranges are served from shift_rollup; only live rows and
+    rotation shifts are aggregated on the fly. Rollups only exist for whole periods, so the
+    range is widened to whole periods for the live rows too.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    start_date = period_start(start_date, period)
+    if period_start(end_date, period) != end_date:
+        end_date = next_period_start(end_date, period)
+
+    facility_id = current_facility_id()
+    totals = live_totals(start_date, end_date, facility_id)
+    for shift in expand(start_date, end_date, [caregiver_id] if caregiver_id else None):
+        add_to_totals(totals, shift.caregiver_id, shift.date, 1, shift.duration_hours)
+    query = ShiftRollup.query.join(Caregiver).filter(
+        Caregiver.facility_id == facility_id,
+        ShiftRollup.period == period,
+        ShiftRollup.period_start >= start_date,
+        ShiftRollup.period_start < end_date
+    )
+    if caregiver_id:
+        query = query.filter(ShiftRollup.caregiver_id == caregiver_id)
+    for rollup in query.all():
+        entry = totals[(rollup.caregiver_id, period, rollup.period_start)]
+        entry[0] += rollup.shift_count
+        entry[1] += rollup.hours
+
+    history = []
+    for (cg_id, p, start), (shift_count, hours) in sorted(totals.items(), key=lambda i: (i[0][2], i[0][0])):
+        if p != period or (caregiver_id and cg_id != caregiver_id):
+            continue
+        history.append({
+            'caregiver_id': cg_id,
+            'period_start': start.isoformat(),
+            'shifts': shift_count,
+            'hours': hours
+        })
+    return history
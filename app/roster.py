@@ -0,0 +1,83 @@
+from bisect import bisect_left, bisect_right
+from .models import db, Caregiver
+from .cache import data_version
+from .facilities import current_facility_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 200
+
+def _keys(name):
+    """The folded name from each word onwards, so "g" and "mariah g" both find "Mariah G"."""
+    folded = ' '.join(name.casefold().split())
+    keys = [folded]
+    for i, char in enumerate(folded):
+        if char == ' ':
+            keys.append(folded[i + 1:])
+    return keys
+
+class NameIndex:
+    """One facility's caregiver names as sorted keys for bisect prefix lookups."""
+
+    def __init__(self, caregivers):
+        self.names = dict(caregivers)
+        entries = sorted((key, cid) for cid, name in caregivers for key in _keys(name))
+        self._keys = [key for key, _ in entries]
+        self._ids = [cid for _, cid in entries]
+
+    def search(self, prefix):
+        """Ids of caregivers with a name word starting with ``prefix``, ordered by name."""
+        prefix = ' '.join(prefix.casefold().split())
+        if not prefix:
+            return []
+        start = bisect_left(self._keys, prefix)
+        matches = set()
+        for i in range(start, len(self._keys)):
+            if not self._keys[i].startswith(prefix):
+                break
+            matches.add(self._ids[i])
+        return sorted(matches, key=lambda cid: (self.names[cid].casefold(), cid))
+
+# facility_id -> (caregiver data version, NameIndex)
+_indexes = {}
+
+def name_index(facility_id=None):
+    """The NameIndex for a facility, rebuilt once any caregiver has changed since it was built.
+
+    Keyed on the caregiver data version rather than cleared by listeners,
+    so renames made by another worker are picked up too.
+    """
+    facility_id = facility_id or current_facility_id()
+    version = data_version('caregiver')
+    cached = _indexes.get(facility_id)
+    if cached is None or cached[0] != version:
+        rows = db.session.query(Caregiver.id, Caregiver.name).filter(Caregiver.facility_id == facility_id).all()
+        cached = (version, NameIndex([(cid, name) for cid, name in rows]))
+        _indexes[facility_id] = cached
+        logger.debug(f"Built caregiver name index for facility {facility_id}: {len(rows)} caregivers")
+    return cached[1]
+
+def search_names(prefix, limit=10):
+    """[{'id', 'name'}] of the current facility's caregivers matching ``prefix``, for typeahead."""
+    index = name_index()
+    return [{'id': cid, 'name': index.names[cid]} for cid in index.search(prefix)[:limit]]
+
+def roster_page(after=None, limit=20, q=None):
+    """One page of the current facility's caregivers in id order, after id ``after``.
+
+    ``q`` keeps only names with a word starting with it. Returns
+    (caregivers, next_after); next_after is None on the last page.
+    """
+    query = Caregiver.query.filter(Caregiver.facility_id == current_facility_id())
+    if q:
+        ids = sorted(name_index().search(q))
+        ids = ids[bisect_right(ids, after or 0):][:limit + 1]
+        query = query.filter(Caregiver.id.in_(ids))
+    elif after:
+        query = query.filter(Caregiver.id > after)
+    caregivers = query.order_by(Caregiver.id).limit(limit + 1).all()
+    if len(caregivers) > limit:
+        caregivers = caregivers[:limit]
+        return caregivers, caregivers[-1].id
+    return caregivers, None
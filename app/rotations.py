@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from dateutil.rrule import rrule, WEEKLY
+from sqlalchemy import func
+from .models import db, Shift, Caregiver, RotationTemplate, RotationEntry, RotationSkip
+from .shift_types import get_registry
+from .facilities import current_facility_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ScheduledShift:
+    """A shift produced by a rotation template rather than stored as a row.
+
+    Quacks like Shift for templates and the schedule checks; ``id`` is a
+    string token that remove_shift turns into a RotationSkip.
+    """
+    virtual = True
+
+    def __init__(self, entry, date, caregiver=None):
+        self.id = f"rotation-{entry.id}-{date.isoformat()}"
+        self.entry_id = entry.id
+        self.template_id = entry.template_id
+        self.date = date
+        self.shift_type = entry.shift_type
+        self.caregiver_id = entry.caregiver_id
+        self.caregiver = caregiver
+
+    @property
+    def definition(self):
+        return get_registry().get(self.shift_type)
+
+    @property
+    def time_range(self):
+        return self.definition.time
+
+    @property
+    def start_hour(self):
+        return self.definition.start_hour
+
+    @property
+    def duration_hours(self):
+        return self.definition.duration
+
+def parse_virtual_id(value):
+    """(entry_id, date) from a ScheduledShift id, or None for a stored shift id."""
+    if not isinstance(value, str) or not value.startswith('rotation-'):
+        return None
+    _, entry_id, date_str = value.split('-', 2)
+    return int(entry_id), datetime.strptime(date_str, '%Y-%m-%d').date()
+
+def entry_dates(template, entry, start_date, end_date):
+    """Dates in [start_date, end_date) on which ``entry`` falls."""
+    interval = template.cycle_weeks
+    first = template.start_date + timedelta(weeks=entry.week, days=entry.weekday)
+    last = end_date - timedelta(days=1)
+    if template.until and template.until < last:
+        last = template.until
+    if last < first or last < start_date:
+        return []
+    # Jump straight to the first cycle that can reach start_date instead of
+    # walking the rule from the template's beginning
+    if first < start_date:
+        cycles = -(-(start_date - first).days // (7 * interval))
+        first += timedelta(weeks=cycles * interval)
+    if first > last:
+        return []
+    rule = rrule(WEEKLY, interval=interval, dtstart=datetime.combine(first, datetime.min.time()),
+                 until=datetime.combine(last, datetime.min.time()))
+    return [dt.date() for dt in rule]
+
+def expand(start_date, end_date, caregiver_ids=None, with_caregivers=False):
+    """Rotation shifts in [start_date, end_date) without a RotationSkip.
+
+    Stored shifts in the same slot do not hide them; an occurrence replaced
+    by a stored shift has its own skip.
+    """
+    facility_id = current_facility_id()
+    templates = RotationTemplate.query.filter(
+        RotationTemplate.facility_id == facility_id,
+        RotationTemplate.start_date < end_date,
+        db.or_(RotationTemplate.until.is_(None), RotationTemplate.until >= start_date)
+    ).all()
+    if not templates:
+        return []
+
+    entries = RotationEntry.query.filter(RotationEntry.template_id.in_([t.id for t in templates]))
+    if caregiver_ids is not None:
+        entries = entries.filter(RotationEntry.caregiver_id.in_(caregiver_ids))
+    entries = entries.order_by(RotationEntry.id).all()
+    if not entries:
+        return []
+
+    skipped = set(db.session.query(RotationSkip.entry_id, RotationSkip.date).filter(
+        RotationSkip.date >= start_date, RotationSkip.date < end_date
+    ))
+    caregivers = {}
+    if with_caregivers:
+        ids = {entry.caregiver_id for entry in entries}
+        caregivers = {c.id: c for c in Caregiver.query.filter(Caregiver.id.in_(ids))}
+
+    by_id = {t.id: t for t in templates}
+    shifts = []
+    for entry in entries:
+        for date in entry_dates(by_id[entry.template_id], entry, start_date, end_date):
+            if (entry.id, date) in skipped:
+                continue
+            shifts.append(ScheduledShift(entry, date, caregivers.get(entry.caregiver_id)))
+    return shifts
+
+def schedule_between(start_date, end_date, caregiver_ids=None):
+    """Stored and rotation shifts in [start_date, end_date), ordered by date and shift type.
+
+    ``caregiver_ids`` limits it to those caregivers' shifts.
+    """
+    stored = Shift.query.filter(
+        Shift.facility_id == current_facility_id(),
+        Shift.date >= start_date,
+        Shift.date < end_date
+    )
+    if caregiver_ids is not None:
+        stored = stored.filter(Shift.caregiver_id.in_(caregiver_ids))
+    stored = stored.join(Caregiver).order_by(Shift.date, Shift.shift_type).all()
+    shifts = stored + expand(start_date, end_date, caregiver_ids, with_caregivers=True)
+    shifts.sort(key=lambda s: (s.date, s.shift_type))
+    return shifts
+
+def template_from_week(name, week_start, cycle_weeks=1, until=None):
+    """Capture the stored week starting ``week_start`` as a rotation that repeats every ``cycle_weeks`` weeks."""
+    template = RotationTemplate(name=name, start_date=week_start, cycle_weeks=cycle_weeks, until=until,
+                                facility_id=current_facility_id())
+    for shift in schedule_between(week_start, week_start + timedelta(days=7)):
+        entry = RotationEntry(
+            week=0,
+            weekday=shift.date.weekday(),
+            shift_type=shift.shift_type,
+            caregiver_id=shift.caregiver_id
+        )
+        template.entries.append(entry)
+        # The captured week keeps its stored shifts rather than getting a second copy
+        if not getattr(shift, 'virtual', False):
+            template.skips.append(RotationSkip(entry=entry, date=shift.date))
+    return template
+
+def skip_overridden_slots():
+    """Skip rotation occurrences in slots that also have a stored shift, in the current facility.
+
+    Stored shifts used to hide every rotation shift of their date and type;
+    this records that as skips for databases from before occurrences were
+    replaced one at a time. Returns the number of skips added.
+    """
+    facility_id = current_facility_id()
+    first, last = db.session.query(func.min(Shift.date), func.max(Shift.date)).filter(
+        Shift.facility_id == facility_id
+    ).one()
+    if first is None:
+        return 0
+    slots = set(db.session.query(Shift.date, Shift.shift_type).filter(Shift.facility_id == facility_id).distinct())
+    added = 0
+    for shift in expand(first, last + timedelta(days=1)):
+        if (shift.date, shift.shift_type) in slots:
+            db.session.add(RotationSkip(template_id=shift.template_id, entry_id=shift.entry_id, date=shift.date))
+            added += 1
+    return added
+
+def rotation_to_dict(template):
+    return {
+        'id': template.id,
+        'name': template.name,
+        'start_date': template.start_date.isoformat(),
+        'cycle_weeks': template.cycle_weeks,
+        'until': template.until.isoformat() if template.until else None,
+        'entries': [
+            {'id': e.id, 'week': e.week, 'weekday': e.weekday, 'shift_type': e.shift_type, 'caregiver_id': e.caregiver_id}
+            for e in sorted(template.entries, key=lambda e: (e.week, e.weekday, e.shift_type))
+        ]
+    }
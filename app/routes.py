@@ -1,14 +1,36 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, current_app, render_template, request, jsonify, Response
 from datetime import datetime, timedelta
 from dateutil.rrule import rrule, DAILY
-from .models import Caregiver, Shift, db
-from .config import ShiftConfig
+from .models import (Facility, Caregiver, Shift, ShiftArchive, CaregiverAvailability, CaregiverTimeOff, ShiftType,
+                     RotationTemplate, RotationEntry, RotationSkip, db)
+from .retention import get_hours_history
+from .aggregates import load_week_totals, rebuild_week_hours
+from .availability import AvailabilityIndex
+from .conflicts import OccupancyIndex
+from .shift_types import get_registry, parse_headcount
+from .events import bus, format_sse
+from .changelog import get_changes
+from .fairness import fairness_report, rebuild_fairness
+from .payroll import payroll_report, payroll_csv
+from .optimizer import polish_week
+from .what_if import dry_run
+from .swaps import swap_candidates, swap_shifts
+from .gaps import gap_monitor
+from .facilities import current_facility_id
+from .roster import roster_page, search_names, MAX_PAGE_SIZE
+from .write_queue import write_queue
+from .rotations import schedule_between, expand, parse_virtual_id, template_from_week, rotation_to_dict
+import queue
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 views = Blueprint('views', __name__)
 
+@views.app_context_processor
+def inject_shift_registry():
+    return {'shift_registry': get_registry()}
+
 @views.route('/')
 def index():
     try:
@@ -27,10 +49,7 @@ def calendar_view():
         start_date = today - timedelta(days=today.weekday())  # Start from Monday
         dates = list(rrule(DAILY, count=7, dtstart=start_date))
         
-        shifts = Shift.query.filter(
-            Shift.date >= start_date,
-            Shift.date < start_date + timedelta(days=7)
-        ).order_by(Shift.date, Shift.shift_type).all()
+        shifts = schedule_between(start_date, start_date + timedelta(days=7))
         
         logger.debug(f"Found {len(shifts)} shifts for the week")
         return render_template('calendar.html', dates=dates, shifts=shifts)
@@ -47,11 +66,8 @@ def hourly_view():
         start_date = today - timedelta(days=today.weekday())  # Start from Monday
         dates = list(rrule(DAILY, count=7, dtstart=start_date))
         
-        # Get all shifts for the week
-        shifts = Shift.query.filter(
-            Shift.date >= start_date,
-            Shift.date < start_date + timedelta(days=7)
-        ).join(Caregiver).order_by(Shift.date, Shift.shift_type).all()
+        # Get all shifts for the week, and Sunday's in case a night shift runs into Monday
+        shifts = schedule_between(start_date - timedelta(days=1), start_date + timedelta(days=7))
         
         logger.debug(f"Found {len(shifts)} shifts for the week")
         return render_template('hourly.html', dates=dates, shifts=shifts)
@@ -60,22 +76,27 @@ def hourly_view():
         logger.error(f"Error in hourly view: {e}\nTraceback:\n{error_traceback}")
         return render_template('error.html', error=str(e)), 500
 
+def _roster_args():
+    """(after, limit, q) from the query string; the caregiver grid and lists page with these."""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', current_app.config['ROSTER_PAGE_SIZE'], type=int)
+    return after, max(1, min(limit, MAX_PAGE_SIZE)), request.args.get('q', '').strip()
+
 @views.route('/caregivers')
 def caregiver_view():
     try:
         logger.debug("Processing caregiver view request")
-        caregivers = Caregiver.query.all()
+        after, limit, q = _roster_args()
+        caregivers, next_after = roster_page(after, limit, q)
+        caregiver_ids = [c.id for c in caregivers]
         logger.debug(f"Found {len(caregivers)} caregivers")
         
         today = datetime.now().date()
         start_date = today - timedelta(days=today.weekday())  # Start from Monday
         end_date = start_date + timedelta(days=7)  # One week
         
-        # Get shifts for the current week
-        shifts = Shift.query.filter(
-            Shift.date >= start_date,
-            Shift.date < end_date
-        ).order_by(Shift.date, Shift.shift_type).all()
+        # Get shifts for the current week, for this page's caregivers only
+        shifts = schedule_between(start_date, end_date, caregiver_ids)
         
         logger.debug(f"Found {len(shifts)} shifts for the week")
         
@@ -86,12 +107,53 @@ def caregiver_view():
                              caregivers=caregivers,
                              week_dates=week_dates,
                              shifts=shifts,
-                             shift_types=ShiftConfig.SHIFTS)
+                             week_totals=load_week_totals(start_date, caregiver_ids),
+                             shift_types=get_registry(),
+                             page=(after, limit, q),
+                             next_after=next_after)
     except Exception as e:
         error_traceback = traceback.format_exc()
         logger.error(f"Error in caregiver view: {e}\nTraceback:\n{error_traceback}")
         raise
 
+def _add_shift(caregiver_id, shift_type, date):
+    """Validate and stage a new shift; runs on the write queue so the checks and insert are serialized."""
+    registry = get_registry()
+    facility_id = current_facility_id()
+    if not Caregiver.query.filter_by(id=caregiver_id, facility_id=facility_id).first():
+        return {'error': 'Caregiver not found'}, 404
+    
+    # Check if the slot is already fully staffed in this facility
+    existing_shifts = Shift.query.filter_by(
+        facility_id=facility_id,
+        date=date,
+        shift_type=shift_type
+    ).count()
+    existing_shifts += sum(1 for s in expand(date, date + timedelta(days=1)) if s.shift_type == shift_type)
+    
+    if existing_shifts >= max(registry[shift_type].headcount[date.weekday()], 1):
+        return {'error': 'Shift already assigned'}, 400
+        
+    # Check the caregiver's availability and time off
+    availability = AvailabilityIndex.load(date, date + timedelta(days=1), [caregiver_id])
+    if not availability.can_work(caregiver_id, date, shift_type):
+        return {'error': 'Caregiver is not available for this shift'}, 400
+    
+    # Check rest, overlap and consecutive-day rules against the caregiver's other shifts
+    occupancy = OccupancyIndex.load(date, date + timedelta(days=1), [caregiver_id])
+    conflicts = occupancy.check(caregiver_id, date, shift_type)
+    if conflicts:
+        return {'error': f"Shift conflicts with caregiver's schedule: {'; '.join(conflicts)}"}, 400
+        
+    # Create new shift
+    new_shift = Shift(
+        date=date,
+        shift_type=shift_type,
+        caregiver_id=caregiver_id
+    )
+    db.session.add(new_shift)
+    return {'message': 'Shift added successfully'}, 200
+
 @views.route('/add_shift', methods=['POST'])
 def add_shift():
     try:
@@ -105,34 +167,20 @@ def add_shift():
         if not all([caregiver_id, shift_type, date_str]):
             return jsonify({'error': 'Missing required fields'}), 400
             
-        # Convert date string to date object
-        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        try:
+            date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            caregiver_id = int(caregiver_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid caregiver ID or date'}), 400
         
-        # Check if shift already exists
-        existing_shift = Shift.query.filter_by(
-            date=date,
-            shift_type=shift_type
-        ).first()
-        
-        if existing_shift:
-            return jsonify({'error': 'Shift already assigned'}), 400
-            
         # Check if shift type is valid
-        if shift_type not in ShiftConfig.SHIFTS:
+        if shift_type not in get_registry():
             return jsonify({'error': 'Invalid shift type'}), 400
             
-        # Create new shift
-        new_shift = Shift(
-            date=date,
-            shift_type=shift_type,
-            caregiver_id=caregiver_id
-        )
-        
-        db.session.add(new_shift)
-        db.session.commit()
-        logger.debug("Successfully added new shift")
-        
-        return jsonify({'message': 'Shift added successfully'})
+        body, status = write_queue.submit(_add_shift, caregiver_id, shift_type, date)
+        if status == 200:
+            logger.debug("Successfully added new shift")
+        return jsonify(body), status
         
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -140,6 +188,30 @@ def add_shift():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _remove_shift(shift_id):
+    # Rotation shifts are cancelled for that date rather than deleted
+    try:
+        occurrence = parse_virtual_id(shift_id)
+    except (TypeError, ValueError):
+        return {'error': 'Invalid shift ID'}, 400
+    if occurrence:
+        entry_id, date = occurrence
+        entry = RotationEntry.query.get(entry_id)
+        if (not entry or entry.template.facility_id != current_facility_id() or
+                RotationSkip.query.filter_by(entry_id=entry_id, date=date).first()):
+            return {'error': 'Shift not found'}, 404
+        db.session.add(RotationSkip(template_id=entry.template_id, entry_id=entry_id, date=date))
+        logger.debug(f"Cancelled rotation entry {entry_id} on {date}")
+        return {'message': 'Shift removed successfully'}, 200
+        
+    shift = Shift.query.filter_by(id=shift_id, facility_id=current_facility_id()).first()
+    if not shift:
+        return {'error': 'Shift not found'}, 404
+        
+    db.session.delete(shift)
+    logger.debug(f"Successfully removed shift with ID {shift_id}")
+    return {'message': 'Shift removed successfully'}, 200
+
 @views.route('/remove_shift', methods=['POST'])
 def remove_shift():
     try:
@@ -148,15 +220,8 @@ def remove_shift():
         if not shift_id:
             return jsonify({'error': 'Missing shift ID'}), 400
             
-        shift = Shift.query.get(shift_id)
-        if not shift:
-            return jsonify({'error': 'Shift not found'}), 404
-            
-        db.session.delete(shift)
-        db.session.commit()
-        logger.debug(f"Successfully removed shift with ID {shift_id}")
-        
-        return jsonify({'message': 'Shift removed successfully'})
+        body, status = write_queue.submit(_remove_shift, shift_id)
+        return jsonify(body), status
         
     except Exception as e:
         error_traceback = traceback.format_exc()
@@ -164,16 +229,106 @@ def remove_shift():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@views.route('/api/shifts/<shift_id>/swaps')
+def list_swap_candidates(shift_id):
+    days = request.args.get('days', 7, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    if not (0 <= days <= 28 and 0 < limit <= 100):
+        return jsonify({'error': 'days must be 0-28 and limit 1-100'}), 400
+    
+    try:
+        result = swap_candidates(shift_id, days, limit)
+        if result is None:
+            return jsonify({'error': 'Shift not found'}), 404
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error finding swap candidates: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/swaps', methods=['POST'])
+def apply_swap():
+    data = request.get_json(silent=True) or request.form
+    shift_id = data.get('shift_id')
+    other_id = data.get('partner_shift_id')
+    if not shift_id or not other_id:
+        return jsonify({'error': 'shift_id and partner_shift_id are required'}), 400
+    
+    try:
+        body, status = write_queue.submit(swap_shifts, shift_id, other_id)
+        return jsonify(body), status
+    except Exception as e:
+        logger.error(f"Error swapping shifts: {e}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @views.route('/manage-caregivers')
 def manage_caregivers():
     try:
-        caregivers = Caregiver.query.order_by(Caregiver.id).all()
-        return render_template('manage_caregivers.html', caregivers=caregivers)
+        after, limit, q = _roster_args()
+        caregivers, next_after = roster_page(after, limit, q)
+        return render_template('manage_caregivers.html', caregivers=caregivers,
+                               page=(after, limit, q), next_after=next_after)
     except Exception as e:
         logger.error(f"Error in manage_caregivers route: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@views.route('/api/facilities', methods=['GET'])
+def list_facilities():
+    try:
+        facilities = Facility.query.order_by(Facility.id).all()
+        return jsonify({
+            'current': current_facility_id(),
+            'facilities': [{'id': f.id, 'name': f.name} for f in facilities]
+        })
+    except Exception as e:
+        logger.error(f"Error listing facilities: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/facilities', methods=['POST'])
+def add_facility():
+    try:
+        name = ((request.get_json() or {}).get('name') or '').strip()
+        if not name:
+            return jsonify({'success': False, 'message': 'Name is required'}), 400
+        if Facility.query.filter_by(name=name).first():
+            return jsonify({'success': False, 'message': 'A facility with that name already exists'}), 400
+        
+        facility = Facility(name=name)
+        db.session.add(facility)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Facility added successfully', 'id': facility.id})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error adding facility: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # API endpoints for caregiver management
+@views.route('/api/caregivers', methods=['GET'])
+def list_caregivers():
+    try:
+        after, limit, q = _roster_args()
+        caregivers, next_after = roster_page(after, limit, q)
+        return jsonify({
+            'caregivers': [{'id': c.id, 'name': c.name} for c in caregivers],
+            'next_after': next_after
+        })
+    except Exception as e:
+        logger.error(f"Error listing caregivers: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/caregivers/search')
+def search_caregivers():
+    q = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    if not 0 < limit <= 50:
+        return jsonify({'error': 'limit must be 1-50'}), 400
+    
+    try:
+        return jsonify({'caregivers': search_names(q, limit)})
+    except Exception as e:
+        logger.error(f"Error searching caregivers: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @views.route('/api/caregivers', methods=['POST'])
 def add_caregiver():
     try:
@@ -183,7 +338,7 @@ def add_caregiver():
         if not name:
             return jsonify({'success': False, 'message': 'Name is required'}), 400
             
-        caregiver = Caregiver(name=name)
+        caregiver = Caregiver(name=name, facility_id=current_facility_id())
         db.session.add(caregiver)
         db.session.commit()
         
@@ -193,6 +348,13 @@ def add_caregiver():
         logger.error(f"Error adding caregiver: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _rename_caregiver(caregiver_id, name):
+    caregiver = Caregiver.query.filter_by(id=caregiver_id, facility_id=current_facility_id()).first()
+    if not caregiver:
+        return {'success': False, 'message': 'Caregiver not found'}, 404
+    caregiver.name = name
+    return {'success': True, 'message': 'Caregiver updated successfully'}, 200
+
 @views.route('/api/caregivers/<int:caregiver_id>', methods=['PUT'])
 def update_caregiver(caregiver_id):
     try:
@@ -202,11 +364,8 @@ def update_caregiver(caregiver_id):
         if not name:
             return jsonify({'success': False, 'message': 'Name is required'}), 400
             
-        caregiver = Caregiver.query.get_or_404(caregiver_id)
-        caregiver.name = name
-        db.session.commit()
-        
-        return jsonify({'success': True, 'message': 'Caregiver updated successfully'})
+        body, status = write_queue.submit(_rename_caregiver, caregiver_id, name)
+        return jsonify(body), status
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating caregiver: {e}")
@@ -215,11 +374,15 @@ def update_caregiver(caregiver_id):
 @views.route('/api/caregivers/<int:caregiver_id>', methods=['DELETE'])
 def delete_caregiver(caregiver_id):
     try:
-        caregiver = Caregiver.query.get_or_404(caregiver_id)
+        caregiver = Caregiver.query.filter_by(id=caregiver_id, facility_id=current_facility_id()).first_or_404()
         
         # Check if caregiver has any shifts
         if caregiver.shifts:
             return jsonify({'success': False, 'message': 'Cannot delete caregiver with assigned shifts'}), 400
+        if ShiftArchive.query.filter_by(caregiver_id=caregiver_id).first():
+            return jsonify({'success': False, 'message': 'Cannot delete caregiver with archived shifts'}), 400
+        if RotationEntry.query.filter_by(caregiver_id=caregiver_id).first():
+            return jsonify({'success': False, 'message': 'Cannot delete caregiver with rotation shifts'}), 400
             
         db.session.delete(caregiver)
         db.session.commit()
@@ -230,6 +393,410 @@ def delete_caregiver(caregiver_id):
         logger.error(f"Error deleting caregiver: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@views.route('/api/caregivers/<int:caregiver_id>/availability', methods=['GET'])
+def get_availability(caregiver_id):
+    caregiver = Caregiver.query.filter_by(id=caregiver_id, facility_id=current_facility_id()).first_or_404()
+    return jsonify({
+        'windows': [{
+            'weekday': w.weekday,
+            'start_hour': w.start_hour,
+            'end_hour': w.end_hour,
+            'preferred': w.preferred
+        } for w in caregiver.availability],
+        'time_off': [{
+            'id': t.id,
+            'date': t.date.isoformat(),
+            'start_hour': t.start_hour,
+            'end_hour': t.end_hour,
+            'reason': t.reason
+        } for t in caregiver.time_off]
+    })
+
+@views.route('/api/caregivers/<int:caregiver_id>/availability', methods=['PUT'])
+def update_availability(caregiver_id):
+    caregiver = Caregiver.query.filter_by(id=caregiver_id, facility_id=current_facility_id()).first_or_404()
+    try:
+        windows = request.get_json().get('windows', [])
+        
+        new_windows = []
+        for w in windows:
+            weekday, start_hour, end_hour = int(w['weekday']), int(w['start_hour']), int(w['end_hour'])
+            if not (0 <= weekday <= 6 and 0 <= start_hour < end_hour <= 24):
+                return jsonify({'success': False, 'message': f'Invalid availability window: {w}'}), 400
+            new_windows.append(CaregiverAvailability(
+                weekday=weekday,
+                start_hour=start_hour,
+                end_hour=end_hour,
+                preferred=bool(w.get('preferred', False))
+            ))
+        
+        # Replace the whole weekly pattern; an empty list means always available
+        caregiver.availability = new_windows
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Availability updated successfully'})
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid availability data: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating availability: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/caregivers/<int:caregiver_id>/time-off', methods=['POST'])
+def add_time_off(caregiver_id):
+    Caregiver.query.filter_by(id=caregiver_id, facility_id=current_facility_id()).first_or_404()
+    try:
+        data = request.get_json()
+        date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        start_hour, end_hour = int(data.get('start_hour', 0)), int(data.get('end_hour', 24))
+        if not 0 <= start_hour < end_hour <= 24:
+            return jsonify({'success': False, 'message': 'Invalid hour range'}), 400
+        
+        time_off = CaregiverTimeOff(
+            caregiver_id=caregiver_id,
+            date=date,
+            start_hour=start_hour,
+            end_hour=end_hour,
+            reason=data.get('reason')
+        )
+        db.session.add(time_off)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Time off added successfully', 'id': time_off.id})
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid time off data: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error adding time off: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/caregivers/<int:caregiver_id>/time-off/<int:time_off_id>', methods=['DELETE'])
+def delete_time_off(caregiver_id, time_off_id):
+    time_off = CaregiverTimeOff.query.join(Caregiver).filter(
+        CaregiverTimeOff.id == time_off_id,
+        CaregiverTimeOff.caregiver_id == caregiver_id,
+        Caregiver.facility_id == current_facility_id()
+    ).first_or_404()
+    try:
+        db.session.delete(time_off)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Time off deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting time off: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/shift-types', methods=['GET'])
+def list_shift_types():
+    return jsonify([{
+        'code': d.code,
+        'name': d.name,
+        'time': d.time,
+        'start_hour': d.start_hour,
+        'duration': d.duration,
+        'color': d.color,
+        'headcount': list(d.headcount)
+    } for d in get_registry()])
+
+@views.route('/api/shift-types/<code>', methods=['PUT'])
+def save_shift_type(code):
+    # Codes fill String(3) columns and are used as CSS classes in the templates
+    if not (len(code) <= 3 and code.isascii() and code.isalnum()):
+        return jsonify({'success': False, 'message': 'Shift type codes are 1-3 letters or digits'}), 400
+    try:
+        data = request.get_json()
+        shift_type = ShiftType.query.get(code)
+        if shift_type is None:
+            shift_type = ShiftType(code=code, sort_order=ShiftType.query.count())
+            db.session.add(shift_type)
+        old_window = (shift_type.start_hour, shift_type.duration)
+        
+        shift_type.name = data.get('name', shift_type.name or f'{code} Shift')
+        shift_type.start_hour = int(data.get('start_hour', shift_type.start_hour))
+        shift_type.duration = int(data.get('duration', shift_type.duration))
+        shift_type.color = data.get('color', shift_type.color or '#DDDDDD')
+        # New types are not staffed until a headcount is given
+        headcount = data.get('headcount', shift_type.headcount or '0,0,0,0,0,0,0')
+        if isinstance(headcount, list):
+            headcount = ','.join(str(int(c)) for c in headcount)
+        parse_headcount(headcount)
+        shift_type.headcount = headcount
+        
+        if not (0 <= shift_type.start_hour < 24 and 0 < shift_type.duration <= 24):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Invalid start hour or duration'}), 400
+        
+        db.session.commit()
+        
+        # Stored weekly hours depend on durations, night counters on the time window
+        if old_window[1] is not None and old_window[1] != shift_type.duration:
+            rebuild_week_hours()
+        if old_window[0] is not None and old_window != (shift_type.start_hour, shift_type.duration):
+            rebuild_fairness()
+        
+        return jsonify({'success': True, 'message': 'Shift type saved successfully'})
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid shift type data: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving shift type: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/events')
+def event_stream():
+    keepalive = request.args.get('keepalive', 15, type=int)
+    facility_id = current_facility_id()
+
+    def stream():
+        subscription = bus.subscribe()
+        logger.debug(f"Event stream opened ({bus.subscriber_count} subscribers)")
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    payload = subscription.get(timeout=keepalive)
+                    if payload.get('facility_id', facility_id) == facility_id:
+                        yield format_sse(payload)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            bus.unsubscribe(subscription)
+            logger.debug("Event stream closed")
+
+    # The stream can stay open for hours; give the connection back to the pool first
+    db.session.remove()
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@views.route('/api/changes')
+def list_changes():
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        return jsonify(get_changes(since, limit, current_facility_id()))
+    except Exception as e:
+        logger.error(f"Error listing changes: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/history/hours')
+def hours_history():
+    try:
+        period = request.args.get('period', 'week')
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+        caregiver_id = request.args.get('caregiver_id', type=int)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end dates (YYYY-MM-DD) are required'}), 400
+    
+    try:
+        history = get_hours_history(period, start_date, end_date, caregiver_id)
+        return jsonify({'period': period, 'history': history})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error building hours history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/payroll')
+def payroll():
+    try:
+        date = request.args.get('date')
+        date = datetime.strptime(date, '%Y-%m-%d').date() if date else None
+        output = request.args.get('format', 'json')
+        if output not in ('json', 'csv'):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD and format json or csv'}), 400
+    
+    try:
+        report = payroll_report(date)
+        if output == 'csv':
+            return Response(payroll_csv(report), mimetype='text/csv', headers={
+                'Content-Disposition': f"attachment; filename=payroll-{report['period_start']}.csv"
+            })
+        return jsonify(report)
+    except Exception as e:
+        logger.error(f"Error building payroll report: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/fairness')
+def fairness_summary():
+    try:
+        as_of = request.args.get('as_of')
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else datetime.now().date()
+        weeks = request.args.get('weeks', type=int)
+        if weeks is not None and weeks < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'as_of must be YYYY-MM-DD and weeks a positive integer'}), 400
+    
+    try:
+        return jsonify(fairness_report(as_of, weeks))
+    except Exception as e:
+        logger.error(f"Error building fairness report: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/schedule/polish', methods=['POST'])
+def polish_schedule():
+    data = request.get_json(silent=True) or request.form
+    try:
+        start_date = data.get('start_date')
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        else:
+            start_date = datetime.now().date()
+        start_date -= timedelta(days=start_date.weekday())  # Start from Monday
+        budget = float(data.get('seconds', 1.0))
+        seed = data.get('seed')
+        seed = int(seed) if seed is not None else None
+        if not 0 < budget <= 30:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start_date must be YYYY-MM-DD and seconds between 0 and 30'}), 400
+    
+    try:
+        stats = polish_week(start_date, budget, seed)
+        return jsonify({'start_date': start_date.isoformat(), **stats})
+    except Exception as e:
+        logger.error(f"Error polishing schedule: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/schedule/dry-run', methods=['POST'])
+def dry_run_schedule():
+    data = request.get_json(silent=True) or {}
+    try:
+        start_date = data.get('start_date')
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        else:
+            start_date = datetime.now().date()
+        start_date -= timedelta(days=start_date.weekday())  # Start from Monday
+        scenarios = data.get('scenarios') or [{}]
+        if not isinstance(scenarios, list) or not all(isinstance(s, dict) for s in scenarios):
+            raise ValueError('scenarios must be a list of objects')
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e) or 'start_date must be YYYY-MM-DD'}), 400
+
+    try:
+        return jsonify(dry_run(start_date, scenarios))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in schedule dry run: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/gaps')
+def coverage_gaps():
+    within_hours = request.args.get('within_hours', type=float)
+    limit = request.args.get('limit', 100, type=int)
+    if not 0 < limit <= 1000:
+        return jsonify({'error': 'limit must be 1-1000'}), 400
+    
+    try:
+        report = gap_monitor.report(current_facility_id(), within_hours=within_hours)
+        report['gaps'] = report['gaps'][:limit]
+        return jsonify(report)
+    except Exception as e:
+        logger.error(f"Error listing coverage gaps: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/schedule')
+def get_schedule():
+    try:
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+        if end_date <= start_date or (end_date - start_date).days > 366:
+            raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end dates (YYYY-MM-DD, end after start, at most a year apart) are required'}), 400
+    
+    try:
+        shifts = schedule_between(start_date, end_date)
+        return jsonify({'shifts': [{
+            'id': shift.id,
+            'date': shift.date.isoformat(),
+            'shift_type': shift.shift_type,
+            'caregiver_id': shift.caregiver_id,
+            'caregiver_name': shift.caregiver.name if shift.caregiver else None,
+            'time_range': shift.time_range,
+            'hours': shift.duration_hours,
+            'source': 'rotation' if getattr(shift, 'virtual', False) else 'shift'
+        } for shift in shifts]})
+    except Exception as e:
+        logger.error(f"Error expanding schedule: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@views.route('/api/rotations', methods=['GET'])
+def list_rotations():
+    try:
+        templates = RotationTemplate.query.filter_by(facility_id=current_facility_id()).order_by(
+            RotationTemplate.start_date, RotationTemplate.id).all()
+        return jsonify([rotation_to_dict(t) for t in templates])
+    except Exception as e:
+        logger.error(f"Error listing rotations: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/rotations', methods=['POST'])
+def add_rotation():
+    """Create a rotation from explicit entries, or from a stored week with ``from_week``."""
+    try:
+        data = request.get_json() or {}
+        name = data.get('name', '').strip()
+        cycle_weeks = int(data.get('cycle_weeks', 1))
+        until = data.get('until')
+        until = datetime.strptime(until, '%Y-%m-%d').date() if until else None
+        if not name or cycle_weeks < 1:
+            raise ValueError('name and a positive cycle_weeks are required')
+        
+        registry = get_registry()
+        if data.get('from_week'):
+            week = datetime.strptime(data['from_week'], '%Y-%m-%d').date()
+            week -= timedelta(days=week.weekday())
+            template = template_from_week(name, week, cycle_weeks, until)
+        else:
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            template = RotationTemplate(name=name, start_date=start_date - timedelta(days=start_date.weekday()),
+                                        cycle_weeks=cycle_weeks, until=until, facility_id=current_facility_id())
+            caregiver_ids = {c.id for c in Caregiver.query.filter_by(facility_id=template.facility_id)}
+            for entry in data.get('entries', []):
+                week, weekday = int(entry.get('week', 0)), int(entry['weekday'])
+                caregiver_id = int(entry['caregiver_id'])
+                if not (0 <= week < cycle_weeks and 0 <= weekday < 7):
+                    raise ValueError('entry week or weekday out of range')
+                if entry['shift_type'] not in registry or caregiver_id not in caregiver_ids:
+                    raise ValueError('unknown shift type or caregiver')
+                template.entries.append(RotationEntry(week=week, weekday=weekday,
+                                                      shift_type=entry['shift_type'], caregiver_id=caregiver_id))
+        
+        db.session.add(template)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Rotation saved successfully', 'rotation': rotation_to_dict(template)})
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid rotation data: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving rotation: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@views.route('/api/rotations/<int:template_id>', methods=['DELETE'])
+def delete_rotation(template_id):
+    template = RotationTemplate.query.filter_by(id=template_id, facility_id=current_facility_id()).first_or_404()
+    try:
+        db.session.delete(template)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Rotation deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting rotation: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @views.route('/grant')
 def grant_view():
     try:
@@ -239,10 +806,7 @@ def grant_view():
         dates = list(rrule(DAILY, count=7, dtstart=start_date))
         
         # Get all shifts for the week with caregiver information
-        shifts = Shift.query.filter(
-            Shift.date >= start_date,
-            Shift.date < start_date + timedelta(days=7)
-        ).join(Caregiver).order_by(Shift.date, Shift.shift_type).all()
+        shifts = schedule_between(start_date, start_date + timedelta(days=7))
         
         logger.debug(f"Found {len(shifts)} shifts for the week")
         return render_template('grant.html', dates=dates, shifts=shifts)
@@ -1,7 +1,18 @@
 from datetime import datetime, timedelta
 from .models import db, Caregiver, Shift
+from .aggregates import get_week_hours, load_week_totals
+from .availability import AvailabilityIndex
+from .conflicts import OccupancyIndex
+from .fairness import FairnessTable
+from .optimizer import polish_week
+from .rotations import expand, schedule_between
+from .shift_types import get_registry
+from .facilities import current_facility_id
+from .config import ShiftConfig
+from collections import namedtuple
+import copy
+from .events import bus
 from . import create_app
-import random
 
 class ScheduleConstraints:
     def __init__(self):
@@ -10,143 +21,270 @@ class ScheduleConstraints:
         self.hours_per_week = 40  # Total weekly hours per caregiver
 
 def get_caregiver_weekly_shifts(caregiver, start_date, end_date):
-    return Shift.query.filter(
-        Shift.caregiver_id == caregiver.id,
-        Shift.date >= start_date,
-        Shift.date < end_date
-    ).count()
+    # Single-row read from the caregiver_week_hours aggregate
+    return get_week_hours(caregiver.id, start_date)[0]
 
-def get_least_scheduled_caregivers(caregivers, used_today, start_date, end_date, count=1):
+def get_least_scheduled_caregivers(caregivers, used_today, start_date, end_date, count=1,
+                                   shift_date=None, shift_type=None, availability=None, occupancy=None,
+                                   fairness=None, week_totals=None, max_shifts=5):
     available = []
     shift_counts = {}
+    if week_totals is None:
+        week_totals = load_week_totals(start_date)
     
     for cg in caregivers:
         if cg.id not in used_today:
-            shifts = get_caregiver_weekly_shifts(cg, start_date, end_date)
+            if availability and not availability.can_work(cg.id, shift_date, shift_type):
+                continue
+            if occupancy and not occupancy.can_assign(cg.id, shift_date, shift_type):
+                continue
+            shifts = week_totals.get(cg.id, (0, 0))[0]
             shift_counts[cg] = shifts
-            if shifts < 5:  # Max 5 shifts per week
+            if shifts < max_shifts:  # Max 5 shifts per week by default
                 available.append(cg)
     
-    # Sort by number of shifts (least to most)
-    available.sort(key=lambda x: shift_counts[x])
+    # Sort by number of shifts (least to most), then by who has carried fewer night/weekend/holiday
+    # shifts recently, preferring caregivers who asked for this shift
+    def sort_key(cg):
+        return (
+            shift_counts[cg],
+            fairness.cost(cg.id, shift_date, shift_type) if fairness else 0,
+            not availability.prefers(cg.id, shift_date, shift_type) if availability else False
+        )
+    available.sort(key=sort_key)
     return available[:count] if count > 1 else available[0] if available else None
 
-def generate_schedule(start_date, num_weeks=1):
-    # Clear existing shifts
-    Shift.query.delete()
-    db.session.commit()
+RosterEntry = namedtuple('RosterEntry', ['id', 'name'])
 
-    constraints = ScheduleConstraints()
-    caregivers = Caregiver.query.all()
-    current_date = start_date
-    end_date = start_date + timedelta(days=7)
+class WeekSnapshot:
+    """Everything the generator reads for one week, loaded once and detached from the session.
+
+    The week is seen as it would be after generate_schedule clears it:
+    stored shifts inside the week are left out. ``fork()`` gives each
+    planning run its own mutable copies, so several scenarios can be
+    planned from one load.
+    """
+
+    def __init__(self, start_date, caregivers, availability, occupancy, fairness, rotation_shifts):
+        self.start_date = start_date
+        self.end_date = start_date + timedelta(days=7)
+        self.caregivers = caregivers
+        self.availability = availability
+        self.occupancy = occupancy
+        self.fairness = fairness
+        self.rotation_shifts = rotation_shifts
+        self.registry = get_registry()
+
+    @classmethod
+    def load(cls, start_date):
+        end_date = start_date + timedelta(days=7)
+        pad = timedelta(days=OccupancyIndex.padding_days())
+        occupancy = OccupancyIndex(start_date - pad)
+        facility_id = current_facility_id()
+        neighbours = Shift.query.filter(
+            Shift.facility_id == facility_id,
+            Shift.date >= start_date - pad,
+            Shift.date < end_date + pad,
+            db.or_(Shift.date < start_date, Shift.date >= end_date)
+        )
+        for shift in neighbours.all():
+            occupancy.add(shift.caregiver_id, shift.date, shift.shift_type)
+        rotation_shifts = expand(start_date, end_date)
+        for shift in expand(start_date - pad, start_date) + expand(end_date, end_date + pad) + rotation_shifts:
+            occupancy.add(shift.caregiver_id, shift.date, shift.shift_type)
+
+        caregivers = [RosterEntry(c.id, c.name)
+                      for c in Caregiver.query.filter_by(facility_id=facility_id).order_by(Caregiver.id).all()]
+        return cls(
+            start_date,
+            caregivers,
+            AvailabilityIndex.load(start_date, end_date),
+            occupancy,
+            FairnessTable.load(start_date),
+            [(s.date, s.shift_type, s.caregiver_id) for s in rotation_shifts]
+        )
 
-    # Pre-calculate required shifts for the week
-    total_shifts = {
-        'A': 7,   # 1 per day * 7 days
-        'B': 12,  # 2 per day * 6 days (no Saturday)
-        'C': 7,   # 1 per day * 7 days
-        'G': 14   # 2 per day * 7 days
-    }
+    def week_totals(self):
+        totals = {}
+        for _, shift_type, caregiver_id in self.rotation_shifts:
+            count, hours = totals.get(caregiver_id, (0, 0))
+            totals[caregiver_id] = (count + 1, hours + self.registry.hours_for(shift_type))
+        return totals
+
+    def fork(self):
+        """(occupancy, fairness, week_totals) copies for one planning run."""
+        return self.occupancy.copy(), self.fairness.copy(), self.week_totals()
+
+    def without_rotation_shifts_of(self, caregiver_ids):
+        """The snapshot with the rotation shifts of ``caregiver_ids`` dropped, so their slots are planned again."""
+        if not caregiver_ids:
+            return self
+        snapshot = copy.copy(self)
+        snapshot.rotation_shifts = [s for s in self.rotation_shifts if s[2] not in caregiver_ids]
+        return snapshot
+
+def plan_schedule(snapshot, caregivers=None, required_for=None, max_shifts=ShiftConfig.SHIFTS_PER_WEEK):
+    """Greedy assignments for the snapshot's week as [(date, shift_type, caregiver_id)].
+
+    Works only on in-memory state. ``required_for(weekday)`` returns
+    [(shift_type, headcount)] and defaults to the shift type registry.
+    """
+    registry = snapshot.registry
+    required_for = required_for or registry.required
+    caregivers = snapshot.caregivers if caregivers is None else caregivers
+    occupancy, fairness, week_totals = snapshot.fork()
+    start_date, end_date = snapshot.start_date, snapshot.end_date
+    assignments = []
+    current_date = start_date
 
     for day in range(7):
-        used_caregivers_today = set()
+        covered = [s for s in snapshot.rotation_shifts if s[0] == current_date]
+        used_caregivers_today = {caregiver_id for _, _, caregiver_id in covered}
         
-        # Assign A shift (1 caregiver)
-        cg = get_least_scheduled_caregivers(caregivers, used_caregivers_today, start_date, end_date)
-        if cg:
-            used_caregivers_today.add(cg.id)
-            shift = Shift(date=current_date, shift_type='A', caregiver=cg)
-            db.session.add(shift)
-
-        # Assign G shift (2 caregivers)
-        for _ in range(2):
-            cg = get_least_scheduled_caregivers(caregivers, used_caregivers_today, start_date, end_date)
-            if cg:
-                used_caregivers_today.add(cg.id)
-                shift = Shift(date=current_date, shift_type='G', caregiver=cg)
-                db.session.add(shift)
-
-        # Assign B shift (2 caregivers, except Saturday)
-        if current_date.weekday() != 5:  # Not Saturday
-            for _ in range(2):
-                cg = get_least_scheduled_caregivers(caregivers, used_caregivers_today, start_date, end_date)
+        # Fill night shifts first so the fairness tie-break still has a choice of caregivers
+        required = sorted(required_for(current_date.weekday()), key=lambda item: not registry.get(item[0]).night)
+        for shift_type, needed in required:
+            # Slots a rotation template already covers are left to it
+            needed -= sum(1 for s in covered if s[1] == shift_type)
+            for _ in range(needed):
+                cg = get_least_scheduled_caregivers(caregivers, used_caregivers_today, start_date, end_date,
+                                                    shift_date=current_date, shift_type=shift_type,
+                                                    availability=snapshot.availability, occupancy=occupancy,
+                                                    fairness=fairness, week_totals=week_totals,
+                                                    max_shifts=max_shifts)
                 if cg:
                     used_caregivers_today.add(cg.id)
-                    shift = Shift(date=current_date, shift_type='B', caregiver=cg)
-                    db.session.add(shift)
-
-        # Assign C shift (1 caregiver)
-        cg = get_least_scheduled_caregivers(caregivers, used_caregivers_today, start_date, end_date)
-        if cg:
-            used_caregivers_today.add(cg.id)
-            shift = Shift(date=current_date, shift_type='C', caregiver=cg)
-            db.session.add(shift)
+                    occupancy.add(cg.id, current_date, shift_type)
+                    fairness.record(cg.id, current_date, shift_type)
+                    count, hours = week_totals.get(cg.id, (0, 0))
+                    week_totals[cg.id] = (count + 1, hours + registry.hours_for(shift_type))
+                    assignments.append((current_date, shift_type, cg.id))
 
         current_date += timedelta(days=1)
-        db.session.commit()  # Commit after each day to maintain consistency
+    return assignments
+
+def generate_schedule(start_date, num_weeks=1, polish_seconds=0):
+    """Regenerate the current facility's week starting ``start_date``."""
+    end_date = start_date + timedelta(days=7)
+    facility_id = current_facility_id()
+
+    # Clear existing shifts for the week through the ORM so the aggregates stay in step
+    for shift in Shift.query.filter(Shift.facility_id == facility_id,
+                                    Shift.date >= start_date, Shift.date < end_date).all():
+        db.session.delete(shift)
+    db.session.commit()
+
+    snapshot = WeekSnapshot.load(start_date)
+    for date, shift_type, caregiver_id in plan_schedule(snapshot):
+        db.session.add(Shift(date=date, shift_type=shift_type, caregiver_id=caregiver_id))
+    db.session.commit()
 
     # Validate and fix any missing shifts
     fix_missing_shifts(start_date)
+    if polish_seconds:
+        stats = polish_week(start_date, polish_seconds)
+        print(f"Polished schedule: objective {stats['initial']} -> {stats['best']} "
+              f"({stats['iterations']} iterations, {stats['reassigned']} shifts reassigned)")
+    bus.publish({'type': 'schedule_generated', 'facility_id': facility_id,
+                 'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()})
     print("Schedule generation completed. Validating schedule...")
     validate_schedule(start_date)
 
 def fix_missing_shifts(start_date):
     end_date = start_date + timedelta(days=7)
     current_date = start_date
+    availability = AvailabilityIndex.load(start_date, end_date)
+    occupancy = OccupancyIndex.load(start_date, end_date)
+    fairness = FairnessTable.load(start_date)
+    registry = get_registry()
+    facility_id = current_facility_id()
+    caregivers = Caregiver.query.filter_by(facility_id=facility_id).all()
     
     for day in range(7):
-        # Check each shift type
-        for shift_type in ['A', 'G', 'B', 'C']:
-            if shift_type == 'B' and current_date.weekday() == 5:  # Skip B shift on Saturday
-                continue
-                
-            expected_count = 2 if shift_type in ['G', 'B'] else 1
+        covered = expand(current_date, current_date + timedelta(days=1))
+        # Check each shift type required on this weekday
+        for shift_type, expected_count in registry.required(current_date.weekday()):
             actual_shifts = Shift.query.filter(
+                Shift.facility_id == facility_id,
                 Shift.date == current_date,
                 Shift.shift_type == shift_type
             ).count()
+            actual_shifts += sum(1 for s in covered if s.shift_type == shift_type)
             
             if actual_shifts < expected_count:
                 # Find caregivers with less than 5 shifts who aren't working this day
-                used_today = set(s.caregiver_id for s in Shift.query.filter(Shift.date == current_date).all())
+                used_today = set(s.caregiver_id for s in Shift.query.filter(
+                    Shift.facility_id == facility_id, Shift.date == current_date).all())
+                used_today.update(s.caregiver_id for s in covered)
+                week_totals = load_week_totals(start_date)
                 available = []
                 
-                for cg in Caregiver.query.all():
+                for cg in caregivers:
                     if (cg.id not in used_today and 
-                        get_caregiver_weekly_shifts(cg, start_date, end_date) < 5):
+                        week_totals.get(cg.id, (0, 0))[0] < 5 and
+                        availability.can_work(cg.id, current_date, shift_type) and
+                        occupancy.can_assign(cg.id, current_date, shift_type)):
                         available.append(cg)
                 
                 # Assign missing shifts
                 for _ in range(expected_count - actual_shifts):
                     if available:
-                        cg = min(available, key=lambda x: get_caregiver_weekly_shifts(x, start_date, end_date))
+                        cg = min(available, key=lambda x: (week_totals.get(x.id, (0, 0))[0],
+                                                           fairness.cost(x.id, current_date, shift_type)))
                         available.remove(cg)
                         shift = Shift(date=current_date, shift_type=shift_type, caregiver=cg)
                         db.session.add(shift)
+                        occupancy.add(cg.id, current_date, shift_type)
+                        fairness.record(cg.id, current_date, shift_type)
+                        count, hours = week_totals.get(cg.id, (0, 0))
+                        week_totals[cg.id] = (count + 1, hours + registry.hours_for(shift_type))
                         
         current_date += timedelta(days=1)
     db.session.commit()
 
+def validation_report(start_date, shifts, caregivers, required_for=None, max_shifts=ShiftConfig.SHIFTS_PER_WEEK):
+    """Check a week given as [(date, shift_type, caregiver_id)] against hours, shift and staffing targets."""
+    registry = get_registry()
+    required_for = required_for or registry.required
+    totals, slots = {}, {}
+    for date, shift_type, caregiver_id in shifts:
+        count, hours = totals.get(caregiver_id, (0, 0))
+        totals[caregiver_id] = (count + 1, hours + registry.hours_for(shift_type))
+        slots.setdefault((date, shift_type), []).append(caregiver_id)
+
+    report = {'caregivers': [], 'understaffed': [], 'warnings': []}
+    for caregiver in caregivers:
+        weekly_shifts, weekly_hours = totals.get(caregiver.id, (0, 0))
+        report['caregivers'].append({'id': caregiver.id, 'name': caregiver.name,
+                                     'shifts': weekly_shifts, 'hours': weekly_hours})
+        if weekly_hours != ShiftConfig.HOURS_PER_WEEK:
+            report['warnings'].append(f"{caregiver.name} has {weekly_hours} hours instead of {ShiftConfig.HOURS_PER_WEEK}")
+        if weekly_shifts > max_shifts:
+            report['warnings'].append(f"{caregiver.name} has {weekly_shifts} shifts (more than {max_shifts} days/week)")
+
+    for day in range(7):
+        date = start_date + timedelta(days=day)
+        for shift_type, expected_count in required_for(date.weekday()):
+            assigned = len(slots.get((date, shift_type), []))
+            if assigned < expected_count:
+                report['understaffed'].append({'date': date.isoformat(), 'shift_type': shift_type,
+                                               'assigned': assigned, 'required': expected_count})
+                report['warnings'].append(f"{date.strftime('%A')} {shift_type} Shift has {assigned} of {expected_count} caregivers")
+    return report
+
 def validate_schedule(start_date):
-    caregivers = Caregiver.query.all()
+    caregivers = Caregiver.query.filter_by(facility_id=current_facility_id()).all()
+    names = {c.id: c.name for c in caregivers}
     end_date = start_date + timedelta(days=7)
+    shifts = [(s.date, s.shift_type, s.caregiver_id) for s in schedule_between(start_date, end_date)]
+    report = validation_report(start_date, shifts, caregivers)
 
     print("\nSchedule Validation Report:")
     print("-" * 50)
-    
-    for caregiver in caregivers:
-        weekly_shifts = get_caregiver_weekly_shifts(caregiver, start_date, end_date)
-        weekly_hours = weekly_shifts * 8
-        
-        print(f"\n{caregiver.name}:")
-        print(f"Weekly Shifts: {weekly_shifts}/5")
-        print(f"Weekly Hours: {weekly_hours}/40")
-        
-        if weekly_hours != 40:
-            print(f"WARNING: {caregiver.name} has {weekly_hours} hours instead of 40")
-        if weekly_shifts > 5:
-            print(f"WARNING: {caregiver.name} has {weekly_shifts} shifts (more than 5 days/week)")
+    for entry in report['caregivers']:
+        print(f"\n{entry['name']}:")
+        print(f"Weekly Shifts: {entry['shifts']}/{ShiftConfig.SHIFTS_PER_WEEK}")
+        print(f"Weekly Hours: {entry['hours']}/{ShiftConfig.HOURS_PER_WEEK}")
 
     # Print shift distribution
     print("\nShift Distribution:")
@@ -154,17 +292,18 @@ def validate_schedule(start_date):
     current = start_date
     for day in range(7):
         print(f"\n{current.strftime('%A')}:")
-        for shift_type in ['A', 'G', 'B', 'C']:
-            shifts = Shift.query.filter(
-                Shift.date == current,
-                Shift.shift_type == shift_type
-            ).all()
-            print(f"{shift_type} Shift: {', '.join(s.caregiver.name for s in shifts)}")
+        for shift_type, _ in get_registry().required(current.weekday()):
+            assigned = [names.get(cid, '?') for date, code, cid in shifts if date == current and code == shift_type]
+            print(f"{shift_type} Shift: {', '.join(assigned)}")
         current += timedelta(days=1)
 
+    for warning in report['warnings']:
+        print(f"WARNING: {warning}")
+    return report
+
 if __name__ == '__main__':
     app = create_app()
     with app.app_context():
         start_date = datetime.now().date()
         start_date = start_date - timedelta(days=start_date.weekday())  # Start from Monday
-        generate_schedule(start_date) 
\ No newline at end of file
+        generate_schedule(start_date, polish_seconds=app.config['POLISH_SECONDS']) 
\ No newline at end of file
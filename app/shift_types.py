@@ -0,0 +1,158 @@
+from collections import namedtuple
+from types import MappingProxyType
+from .models import db, ShiftType
+from .cache import data_version
+from .config import ShiftConfig
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 168
+WEEK_MASK = (1 << HOURS_PER_WEEK) - 1
+
+ShiftDefinition = namedtuple('ShiftDefinition', [
+    'code', 'name', 'time', 'start_hour', 'duration', 'color', 'headcount',
+    'day_mask',    # Hours relative to midnight of the shift's date; bits 24+ spill into the next day
+    'week_masks',  # One 168-bit mask per weekday, wrapping from Sunday into Monday
+    'offset_pct',  # Gantt geometry as a percentage of the day
+    'width_pct',
+    'night'        # Most hours fall between NIGHT_START_HOUR and NIGHT_END_HOUR
+])
+
+def hour_range_mask(start_hour, end_hour):
+    """Bits start_hour..end_hour-1 set."""
+    if end_hour <= start_hour:
+        return 0
+    return ((1 << (end_hour - start_hour)) - 1) << start_hour
+
+def format_hour(hour):
+    hour %= 24
+    suffix = 'AM' if hour < 12 else 'PM'
+    return f"{hour % 12 or 12}:00 {suffix}"
+
+def parse_headcount(value):
+    counts = tuple(int(c) for c in value.split(','))
+    if len(counts) != 7:
+        raise ValueError('headcount needs one value per weekday (Monday first)')
+    return counts
+
+# Night window over two days: [0, NIGHT_END) and [NIGHT_START, 24 + NIGHT_END)
+NIGHT_MASK = (hour_range_mask(0, ShiftConfig.NIGHT_END_HOUR) |
+              hour_range_mask(ShiftConfig.NIGHT_START_HOUR, 24 + ShiftConfig.NIGHT_END_HOUR))
+
+def _build_definition(row):
+    day_mask = hour_range_mask(row.start_hour, row.start_hour + row.duration)
+    week_masks = []
+    for weekday in range(7):
+        mask = day_mask << (weekday * 24)
+        week_masks.append((mask | (mask >> HOURS_PER_WEEK)) & WEEK_MASK)
+    return ShiftDefinition(
+        code=row.code,
+        name=row.name,
+        time=f"{format_hour(row.start_hour)} - {format_hour(row.start_hour + row.duration)}",
+        start_hour=row.start_hour,
+        duration=row.duration,
+        color=row.color,
+        headcount=parse_headcount(row.headcount),
+        day_mask=day_mask,
+        week_masks=tuple(week_masks),
+        offset_pct=round(row.start_hour * 100 / 24, 2),
+        width_pct=round(min(row.duration, 24 - row.start_hour) * 100 / 24, 2),
+        night=bin(day_mask & NIGHT_MASK).count('1') * 2 > row.duration
+    )
+
+# Used for codes that are not (or no longer) defined, e.g. legacy rows
+_UNKNOWN = _build_definition(ShiftType(
+    code='?', name='Unknown Shift', start_hour=0, duration=24, color='#DDDDDD', headcount='0,0,0,0,0,0,0'
+))._replace(duration=ShiftConfig.HOURS_PER_SHIFT)
+
+class ShiftTypeRegistry:
+    """Immutable snapshot of the shift_type table with precomputed masks and geometry.
+
+    Iterates in display order and behaves like a read-only mapping of
+    code -> ShiftDefinition, so templates can use ``.items()``.
+    """
+
+    def __init__(self, definitions):
+        self._definitions = MappingProxyType({d.code: d for d in definitions})
+        self._order = tuple(d.code for d in definitions)
+
+    def __contains__(self, code):
+        return code in self._definitions
+
+    def __iter__(self):
+        return (self._definitions[code] for code in self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, code):
+        return self._definitions[code]
+
+    def get(self, code):
+        """Definition for ``code``; unknown codes get a conservative whole-day window."""
+        return self._definitions.get(code, _UNKNOWN)
+
+    def codes(self):
+        return self._order
+
+    def items(self):
+        return [(code, self._definitions[code]) for code in self._order]
+
+    def hours_for(self, code):
+        return self.get(code).duration
+
+    def day_mask(self, code):
+        return self.get(code).day_mask
+
+    def week_mask(self, code, weekday):
+        return self.get(code).week_masks[weekday]
+
+    def covers(self, code, hour):
+        """True if the shift is on duty during ``hour`` counted from midnight of its date; 24-47 are the next day."""
+        return bool(self.get(code).day_mask >> hour & 1)
+
+    def required(self, weekday):
+        """[(code, headcount)] for a weekday, in display order."""
+        return [(d.code, d.headcount[weekday]) for d in self if d.headcount[weekday]]
+
+# (shift_type data version, registry)
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """The registry for the current shift_type data version.
+
+    Keyed on the version rather than cleared by a commit hook, so edits
+    made by another worker are picked up too, and a request renders with
+    the same definitions its fragment cache keys were built from.
+    """
+    global _registry
+    version = data_version('shift_type')
+    cached = _registry
+    if cached is None or cached[0] != version:
+        with _registry_lock:
+            if _registry is None or _registry[0] != version:
+                rows = ShiftType.query.order_by(ShiftType.sort_order, ShiftType.code).all()
+                _registry = (version, ShiftTypeRegistry([_build_definition(row) for row in rows]))
+                logger.debug(f"Loaded shift type registry at version {version}: {list(_registry[1].codes())}")
+            cached = _registry
+    return cached[1]
+
+def seed_shift_types():
+    """Populate shift_type from ShiftConfig.SHIFTS if it is empty."""
+    if ShiftType.query.first() is not None:
+        return
+    for order, (code, info) in enumerate(ShiftConfig.SHIFTS.items()):
+        db.session.add(ShiftType(
+            code=code,
+            name=info['name'],
+            start_hour=info['start_hour'],
+            duration=info['duration'],
+            color=info['color'],
+            headcount=','.join(str(c) for c in info['headcount']),
+            sort_order=order
+        ))
+    db.session.commit()
+    logger.debug(f"Seeded {len(ShiftConfig.SHIFTS)} shift types")
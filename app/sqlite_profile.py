@@ -0,0 +1,45 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new SQLite connection; set from SQLITE_PRAGMAS by configure_sqlite()
+_pragmas = {}
+
+def configure_sqlite(app):
+    """Pool and tune SQLite connections for several threads and worker processes.
+
+    WAL lets readers proceed while a write is in progress, busy_timeout makes
+    writers wait for the lock instead of failing with "database is locked",
+    and synchronous=NORMAL drops the fsync on every commit (WAL stays
+    consistent; only the last commits can be lost on power failure).
+    Must run before db.init_app so the engine picks up the pool options.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not uri.startswith('sqlite') or ':memory:' in uri or uri.rstrip('/') == 'sqlite:':
+        return
+    _pragmas.clear()
+    _pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+
+    # pysqlite defaults to opening a connection per checkout for file databases;
+    # reuse them so the per-connection pragmas and page cache survive
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('poolclass', QueuePool)
+    options.setdefault('pool_size', app.config.get('SQLITE_POOL_SIZE', 10))
+    options.setdefault('max_overflow', 20)
+    options.setdefault('connect_args', {}).setdefault('check_same_thread', False)
+    logger.debug(f"SQLite profile: {_pragmas}")
+
+@event.listens_for(Engine, 'connect')
+def _apply_pragmas(dbapi_connection, connection_record):
+    if not _pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
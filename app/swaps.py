@@ -0,0 +1,209 @@
+from datetime import timedelta
+from collections import defaultdict
+from .models import db, Shift, RotationSkip
+from .aggregates import week_start
+from .availability import AvailabilityIndex
+from .conflicts import OccupancyIndex
+from .rotations import schedule_between, parse_virtual_id
+from .shift_types import get_registry
+from .config import ShiftConfig
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _key(shift):
+    return str(shift.id)
+
+class SwapIndex:
+    """Stored and rotation shifts around a date, indexed for swap lookups.
+
+    ``by_day`` answers "who works on this date" and ``by_caregiver`` "what
+    does this caregiver work"; weekly shift counts, availability masks and
+    the occupancy bitsets are loaded alongside, so ranking partners does
+    not touch the database.
+    """
+
+    def __init__(self, start_date, end_date, shifts, availability, occupancy):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.availability = availability
+        self.occupancy = occupancy
+        self.by_id = {}
+        self.by_day = defaultdict(lambda: defaultdict(list))  # date -> caregiver_id -> shifts
+        self.by_caregiver = defaultdict(list)
+        self.week_counts = defaultdict(int)  # (caregiver_id, week_start) -> shifts
+        for shift in shifts:
+            self.by_id[_key(shift)] = shift
+            self.by_day[shift.date][shift.caregiver_id].append(shift)
+            self.by_caregiver[shift.caregiver_id].append(shift)
+            self.week_counts[(shift.caregiver_id, week_start(shift.date))] += 1
+
+    @classmethod
+    def load(cls, date, days=7):
+        """Index the whole weeks covering ``days`` either side of ``date``."""
+        start_date = week_start(date - timedelta(days=days))
+        end_date = week_start(date + timedelta(days=days)) + timedelta(days=7)
+        return cls(
+            start_date,
+            end_date,
+            schedule_between(start_date, end_date),
+            AvailabilityIndex.load(start_date, end_date),
+            OccupancyIndex.load(start_date, end_date)
+        )
+
+    def get(self, shift_id):
+        return self.by_id.get(str(shift_id))
+
+    def _works_other(self, caregiver_id, date, except_shift):
+        return any(s is not except_shift for s in self.by_day.get(date, {}).get(caregiver_id, ()))
+
+    def _under_cap(self, caregiver_id, take_date, give_date, max_shifts):
+        # Swapping within one week leaves both counts unchanged
+        if week_start(take_date) == week_start(give_date):
+            return True
+        return self.week_counts[(caregiver_id, week_start(take_date))] < max_shifts
+
+    def _can_take(self, caregiver_id, shift, giving):
+        """Whether ``caregiver_id`` may work ``shift`` once ``giving`` is off their schedule."""
+        if not self.availability.can_work(caregiver_id, shift.date, shift.shift_type):
+            return False
+        self.occupancy.remove(caregiver_id, giving.date, giving.shift_type)
+        try:
+            return self.occupancy.can_assign(caregiver_id, shift.date, shift.shift_type)
+        finally:
+            self.occupancy.add(caregiver_id, giving.date, giving.shift_type)
+
+    def check_swap(self, shift, other, max_shifts=ShiftConfig.SHIFTS_PER_WEEK):
+        """Reasons the two caregivers cannot trade these shifts (empty if they can)."""
+        requester, partner = shift.caregiver_id, other.caregiver_id
+        problems = []
+        if requester == partner:
+            return ['both shifts belong to the same caregiver']
+        if (shift.date, shift.shift_type) == (other.date, other.shift_type):
+            return ['both shifts are in the same slot']
+        if self._works_other(partner, shift.date, other):
+            problems.append('partner already works that day')
+        if self._works_other(requester, other.date, shift):
+            problems.append('requester already works that day')
+        if not self._under_cap(partner, shift.date, other.date, max_shifts):
+            problems.append('partner would exceed the weekly shift cap')
+        if not self._under_cap(requester, other.date, shift.date, max_shifts):
+            problems.append('requester would exceed the weekly shift cap')
+        if not problems:
+            if not self._can_take(partner, shift, other):
+                problems.append('partner is unavailable or would break rest/consecutive-day rules')
+            if not self._can_take(requester, other, shift):
+                problems.append('requester is unavailable or would break rest/consecutive-day rules')
+        return problems
+
+    def candidates(self, shift, days=7, limit=10, max_shifts=ShiftConfig.SHIFTS_PER_WEEK):
+        """Ranked swap partners for ``shift`` among shifts within ``days`` of it.
+
+        Best first: equal hours, then shifts either side prefers, then the
+        nearest date, then the partner with the fewest shifts that week.
+        """
+        registry = get_registry()
+        requester = shift.caregiver_id
+        hours = registry.hours_for(shift.shift_type)
+        ranked = []
+        for offset in range(-days, days + 1):
+            date = shift.date + timedelta(days=offset)
+            working = self.by_day.get(date)
+            if not working:
+                continue
+            # The requester must be free that day apart from the shift they give away
+            if self._works_other(requester, date, shift):
+                continue
+            for partner, partner_shifts in working.items():
+                # On other days a partner who also works the requester's day is out straight away
+                if partner == requester or (offset and partner in self.by_day.get(shift.date, ())):
+                    continue
+                for other in partner_shifts:
+                    if self.check_swap(shift, other, max_shifts):
+                        continue
+                    hours_change = registry.hours_for(other.shift_type) - hours
+                    preferred = (int(self.availability.prefers(partner, shift.date, shift.shift_type)) +
+                                 int(self.availability.prefers(requester, other.date, other.shift_type)))
+                    rank = (abs(hours_change), -preferred, abs(offset),
+                            self.week_counts[(partner, week_start(shift.date))], partner)
+                    ranked.append((rank, other, hours_change, preferred))
+        ranked.sort(key=lambda item: item[0])
+        return [
+            {
+                'shift_id': other.id,
+                'date': other.date.isoformat(),
+                'shift_type': other.shift_type,
+                'caregiver_id': other.caregiver_id,
+                'caregiver_name': other.caregiver.name if other.caregiver else None,
+                'hours_change': hours_change,
+                'preferred': preferred,
+                'days_apart': (other.date - shift.date).days
+            }
+            for _, other, hours_change, preferred in ranked[:limit]
+        ]
+
+def _materialize(shift):
+    """The stored Shift for ``shift``, turning a rotation occurrence into a row that replaces it."""
+    if not getattr(shift, 'virtual', False):
+        return shift
+    db.session.add(RotationSkip(template_id=shift.template_id, entry_id=shift.entry_id, date=shift.date))
+    row = Shift(date=shift.date, shift_type=shift.shift_type, caregiver_id=shift.caregiver_id)
+    db.session.add(row)
+    return row
+
+def swap_shifts(shift_id, other_id):
+    """Trade two shifts between their caregivers; meant to run on the write queue.
+
+    Re-checks the swap against current data and stages both changes (and
+    any rotation skips) so they commit together.
+    """
+    shift_date = _shift_date(shift_id)
+    other_date = _shift_date(other_id)
+    if shift_date is None or other_date is None:
+        return {'error': 'Shift not found'}, 404
+    days = abs((other_date - shift_date).days)
+    index = SwapIndex.load(shift_date, days)
+    shift, other = index.get(shift_id), index.get(other_id)
+    if shift is None or other is None:
+        return {'error': 'Shift not found'}, 404
+
+    problems = index.check_swap(shift, other)
+    if problems:
+        return {'error': f"Swap not allowed: {'; '.join(problems)}"}, 400
+
+    requester, partner = shift.caregiver_id, other.caregiver_id
+    shift, other = _materialize(shift), _materialize(other)
+    shift.caregiver_id = partner
+    other.caregiver_id = requester
+    logger.debug(f"Swapped {shift_id} ({requester} -> {partner}) with {other_id}")
+    return {'message': 'Shifts swapped successfully'}, 200
+
+def _shift_date(shift_id):
+    try:
+        occurrence = parse_virtual_id(shift_id)
+        if occurrence:
+            return occurrence[1]
+        shift = Shift.query.get(int(shift_id))
+    except (TypeError, ValueError):
+        return None
+    return shift.date if shift else None
+
+def swap_candidates(shift_id, days=7, limit=10):
+    """{'shift': ..., 'candidates': [...]} for the shift with ``shift_id``, or None if it does not exist."""
+    date = _shift_date(shift_id)
+    if date is None:
+        return None
+    index = SwapIndex.load(date, days)
+    shift = index.get(shift_id)
+    if shift is None:
+        return None
+    return {
+        'shift': {
+            'id': shift.id,
+            'date': shift.date.isoformat(),
+            'shift_type': shift.shift_type,
+            'caregiver_id': shift.caregiver_id,
+            'caregiver_name': shift.caregiver.name if shift.caregiver else None
+        },
+        'candidates': index.candidates(shift, days, limit)
+    }
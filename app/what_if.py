@@ -0,0 +1,109 @@
+from collections import Counter
+from datetime import timedelta
+from .rotations import schedule_between
+from .schedule_generator import WeekSnapshot, plan_schedule, validation_report
+from .shift_types import parse_headcount
+from .config import ShiftConfig
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_SCENARIOS = 8
+
+def _required_for(registry, headcount):
+    """A ``required_for(weekday)`` with the scenario's headcount overrides applied."""
+    overrides = {}
+    for code, value in (headcount or {}).items():
+        if code not in registry:
+            raise ValueError(f'unknown shift type {code!r}')
+        if isinstance(value, int):
+            counts = (value,) * 7
+        elif isinstance(value, str):
+            counts = parse_headcount(value)
+        else:
+            counts = tuple(int(v) for v in value)
+        if len(counts) != 7 or min(counts) < 0:
+            raise ValueError(f'headcount for {code} needs one non-negative value per weekday')
+        overrides[code] = counts
+
+    def required_for(weekday):
+        result = []
+        for definition in registry:
+            count = overrides.get(definition.code, definition.headcount)[weekday]
+            if count:
+                result.append((definition.code, count))
+        return result
+    return required_for
+
+def parse_scenario(data, snapshot, index=0):
+    """Validate one scenario dict: name, headcount overrides, excluded caregivers and weekly shift cap."""
+    exclude = {int(cid) for cid in data.get('exclude_caregivers', [])}
+    max_shifts = int(data.get('max_shifts', ShiftConfig.SHIFTS_PER_WEEK))
+    if not 1 <= max_shifts <= 7:
+        raise ValueError('max_shifts must be between 1 and 7')
+    return {
+        'name': str(data.get('name') or f'Scenario {index + 1}'),
+        'required_for': _required_for(snapshot.registry, data.get('headcount')),
+        'exclude': exclude,
+        'caregivers': [c for c in snapshot.caregivers if c.id not in exclude],
+        'max_shifts': max_shifts
+    }
+
+def diff_schedules(current, proposed):
+    """Added/removed (date, shift_type, caregiver_id) assignments between two weeks."""
+    current, proposed = Counter(current), Counter(proposed)
+    return {
+        'added': sorted((proposed - current).elements()),
+        'removed': sorted((current - proposed).elements()),
+        'unchanged': sum((current & proposed).values())
+    }
+
+def _shift_dict(shift, names):
+    date, shift_type, caregiver_id = shift
+    return {'date': date.isoformat(), 'shift_type': shift_type,
+            'caregiver_id': caregiver_id, 'caregiver_name': names.get(caregiver_id)}
+
+def run_scenario(snapshot, scenario, stored, names):
+    started = time.perf_counter()
+    # Excluded caregivers lose their rotation shifts too; those slots are planned like any other
+    snapshot = snapshot.without_rotation_shifts_of(scenario['exclude'])
+    planned = plan_schedule(snapshot, scenario['caregivers'], scenario['required_for'], scenario['max_shifts'])
+    proposed = sorted(snapshot.rotation_shifts + planned)
+    report = validation_report(snapshot.start_date, proposed, snapshot.caregivers,
+                               scenario['required_for'], scenario['max_shifts'])
+    diff = diff_schedules(stored, proposed)
+    return {
+        'name': scenario['name'],
+        'schedule': [_shift_dict(s, names) for s in proposed],
+        'report': report,
+        'diff': {
+            'added': [_shift_dict(s, names) for s in diff['added']],
+            'removed': [_shift_dict(s, names) for s in diff['removed']],
+            'unchanged': diff['unchanged']
+        },
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def dry_run(start_date, scenarios=None):
+    """Plan the week starting ``start_date`` under each scenario without writing anything.
+
+    The database is read once into a snapshot and each scenario is planned
+    on its own copy of it. Planning is CPU-bound, so the scenarios run one
+    after another in the request.
+    """
+    scenarios = scenarios or [{}]
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f'at most {MAX_SCENARIOS} scenarios per request')
+
+    snapshot = WeekSnapshot.load(start_date)
+    parsed = [parse_scenario(data, snapshot, i) for i, data in enumerate(scenarios)]
+    stored = sorted((s.date, s.shift_type, s.caregiver_id)
+                    for s in schedule_between(start_date, start_date + timedelta(days=7)))
+    names = {c.id: c.name for c in snapshot.caregivers}
+
+    return {
+        'start_date': start_date.isoformat(),
+        'stored': [_shift_dict(s, names) for s in stored],
+        'scenarios': [run_scenario(snapshot, scenario, stored, names) for scenario in parsed]
+    }
@@ -0,0 +1,117 @@
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+import logging
+
+from .models import db
+from .facilities import bind_facility
+
+logger = logging.getLogger(__name__)
+
+class WriteQueue:
+    """Funnel short mutations through one writer thread and commit them in batches.
+
+    A job is a function that makes ORM changes without committing and
+    returns the value handed back to the caller. The writer drains up to
+    ``max_batch`` jobs (waiting at most ``max_delay`` seconds for more),
+    runs them in one transaction and commits once, so concurrent requests
+    share a single lock acquisition and fsync. If any job in a batch
+    fails, the batch is rolled back and each job is retried on its own so
+    only the failing one sees the error.
+
+    When disabled, ``submit`` runs the job and commits inline. Either way
+    the job sees the submitting request's facility.
+    """
+
+    def __init__(self, max_batch=32, max_delay=0.005, timeout=30):
+        self.enabled = False
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._app = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.batches = 0
+        self.jobs = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get('WRITE_QUEUE', False)
+        self.max_batch = app.config.get('WRITE_QUEUE_MAX_BATCH', self.max_batch)
+        self.max_delay = app.config.get('WRITE_QUEUE_MAX_DELAY_MS', self.max_delay * 1000) / 1000
+
+    def submit(self, job, *args, **kwargs):
+        job = bind_facility(job)
+        if not self.enabled:
+            try:
+                result = job(*args, **kwargs)
+                db.session.commit()
+                return result
+            except Exception:
+                db.session.rollback()
+                raise
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((future, job, args, kwargs))
+        return future.result(timeout=self.timeout)
+
+    def _ensure_worker(self):
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name='write-queue', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self._app.app_context():
+            while True:
+                batch = self._next_batch()
+                try:
+                    self._run_batch(batch)
+                except Exception as e:
+                    logger.error(f"Write queue batch failed: {e}")
+                    for future, _, _, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _run_batch(self, batch):
+        results = []
+        try:
+            for _, job, args, kwargs in batch:
+                results.append(job(*args, **kwargs))
+                db.session.flush()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][0].set_exception(e)
+            else:
+                for item in batch:
+                    self._run_batch([item])
+            return
+        self.batches += 1
+        self.jobs += len(batch)
+        for (future, _, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+write_queue = WriteQueue()
@@ -0,0 +1,243 @@
+"""Concurrent load test against the app running under gunicorn.
+
+Usage: python benchmarks/loadtest.py [--clients 20] [--duration 30] [--workers 2] [--threads 8]
+                                     [--database-url postgresql://...] [--mix views=60,add=15,...]
+
+Starts gunicorn on a free local port (with a throwaway SQLite database
+unless --database-url is given), drives it from --clients threads for
+--duration seconds and prints per-endpoint throughput, p50/p95/p99
+latency, 4xx rejections and errors (5xx or connection failures).
+Rejected adds (slot already filled, conflicts) are normal under load and
+are reported separately from errors. The test adds, removes and renames,
+so only point --database-url at a scratch database.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIEWS = ['/', '/calendar', '/hourly', '/caregivers', '/grant', '/manage-caregivers']
+DEFAULT_MIX = 'views=60,add=15,remove=10,caregiver_api=15'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.rejected = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            if status is None or status >= 500:
+                self.errors[endpoint] += 1
+            elif status >= 400:
+                self.rejected[endpoint] += 1
+
+    def report(self, elapsed):
+        rows = []
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(values),
+                'rps': len(values) / elapsed,
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+                'rejected': self.rejected[endpoint],
+                'error_rate': self.errors[endpoint] / len(values)
+            })
+        return rows
+
+class Client(threading.Thread):
+    """One simulated user with a keep-alive connection."""
+
+    def __init__(self, port, mix, stats, deadline, seed):
+        super().__init__(daemon=True)
+        self.port = port
+        self.mix = mix
+        self.stats = stats
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.conn = None
+        self.monday = date.today() - timedelta(days=date.today().weekday())
+
+    def request(self, label, method, path, body=None, content_type='application/x-www-form-urlencoded'):
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            headers['Content-Type'] = content_type
+        start = time.perf_counter()
+        status, data = None, b''
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+        self.stats.record(label, time.perf_counter() - start, status)
+        return status, data
+
+    def view(self):
+        path = self.rng.choice(VIEWS)
+        self.request(f'GET {path}', 'GET', path)
+
+    def add(self):
+        day = self.monday + timedelta(days=self.rng.randrange(14))
+        form = {
+            'caregiver_id': self.rng.randint(1, 7),
+            'shift_type': self.rng.choice(['A', 'G1', 'G2', 'B', 'C']),
+            'date': day.isoformat()
+        }
+        self.request('POST /add_shift', 'POST', '/add_shift', urlencode(form))
+
+    def remove(self):
+        start = self.monday + timedelta(days=self.rng.randrange(14))
+        query = urlencode({'start': start.isoformat(), 'end': (start + timedelta(days=1)).isoformat()})
+        status, data = self.request('GET /api/schedule', 'GET', f'/api/schedule?{query}')
+        if status != 200:
+            return
+        shifts = json.loads(data).get('shifts', [])
+        if shifts:
+            shift_id = self.rng.choice(shifts)['id']
+            self.request('POST /remove_shift', 'POST', '/remove_shift', urlencode({'shift_id': shift_id}))
+
+    def caregiver_api(self):
+        caregiver_id = self.rng.randint(1, 7)
+        if self.rng.random() < 0.7:
+            self.request('GET /api/caregivers/<id>/availability', 'GET', f'/api/caregivers/{caregiver_id}/availability')
+        else:
+            body = json.dumps({'name': f'Caregiver {caregiver_id}'})
+            self.request('PUT /api/caregivers/<id>', 'PUT', f'/api/caregivers/{caregiver_id}', body, 'application/json')
+
+    def run(self):
+        actions = [getattr(self, name) for name in self.mix]
+        weights = list(self.mix.values())
+        while time.perf_counter() < self.deadline:
+            self.rng.choices(actions, weights)[0]()
+        if self.conn:
+            self.conn.close()
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        if name not in ('views', 'add', 'remove', 'caregiver_api'):
+            raise argparse.ArgumentTypeError(f'unknown mix entry {name!r}')
+        mix['view' if name == 'views' else name] = float(weight)
+    return mix
+
+def start_server(args, env):
+    # Create and seed the schema once so workers don't race each other at import
+    subprocess.run([sys.executable, '-c', 'import wsgi'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    command = [
+        sys.executable, '-m', 'gunicorn', 'wsgi:app',
+        '--bind', f'127.0.0.1:{args.port}',
+        '--workers', str(args.workers),
+        '--worker-class', args.worker_class,
+        '--threads', str(args.threads),
+        '--log-level', 'warning'
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                              stderr=None if args.verbose else subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=2)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit('gunicorn exited during startup (rerun with --verbose)')
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('gunicorn did not start listening')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--database-url', default=None, help='Defaults to a throwaway SQLite file')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Relative weights (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--verbose', action='store_true', help="Show gunicorn's stderr")
+    args = parser.parse_args()
+    args.port = args.port or free_port()
+
+    env = dict(os.environ)
+    env.pop('RENDER', None)
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='loadtest-')
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+
+    server = start_server(args, env)
+    try:
+        stats = Stats()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [Client(args.port, args.mix, stats, deadline, args.seed + i) for i in range(args.clients)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    rows = stats.report(elapsed)
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['error_rate'] * row['requests'] for row in rows)
+    if args.json:
+        print(json.dumps({'elapsed': elapsed, 'requests': total, 'rps': total / elapsed, 'endpoints': rows}, indent=2))
+        return
+
+    print(f"{args.clients} clients, {args.workers} workers x {args.threads} threads ({args.worker_class}), "
+          f"{elapsed:.1f}s against {env['DATABASE_URL'].split(':')[0]}")
+    print(f"{'endpoint':<40} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'4xx':>6} {'errors':>7}")
+    for row in rows:
+        print(f"{row['endpoint']:<40} {row['requests']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['rejected']:>6} {row['error_rate']:>7.1%}")
+    print(f"{'total':<40} {total:>7} {total / elapsed:>8.1f} {'':>35} {errors / max(total, 1):>7.1%}")
+
+if __name__ == '__main__':
+    main()
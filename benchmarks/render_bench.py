@@ -0,0 +1,53 @@
+"""Cold and warm render times for each HTML view.
+
+Usage: python benchmarks/render_bench.py [--runs 50]
+
+Runs against a throwaway SQLite database. "Cold" is the first request
+after clearing the Jinja template cache, the bytecode cache and the
+fragment cache; "warm" is the mean of the following runs.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+VIEWS = ['/', '/calendar', '/hourly', '/caregivers', '/grant', '/manage-caregivers']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='render-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    logging.disable(logging.CRITICAL)
+
+    from app import app
+    from app.cache import fragment_cache
+
+    client = app.test_client()
+    bytecode_cache = app.jinja_env.bytecode_cache
+
+    print(f"{'view':<20} {'cold ms':>10} {'warm ms':>10} {'bytes':>10} {'gzip bytes':>11}")
+    for view in VIEWS:
+        app.jinja_env.cache.clear()
+        bytecode_cache.clear()
+        fragment_cache.clear()
+
+        start = time.perf_counter()
+        response = client.get(view)
+        cold = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            client.get(view)
+        warm = (time.perf_counter() - start) * 1000 / args.runs
+
+        compressed = client.get(view, headers={'Accept-Encoding': 'gzip'})
+        print(f"{view:<20} {cold:>10.2f} {warm:>10.2f} {len(response.data):>10} {len(compressed.data):>11}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+
+# Importing the package builds the module-level app, so point it at a scratch database first
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import.db')}")
+
+import pytest
+from datetime import date, timedelta
+from app import create_app, db, shift_types, facilities, roster
+from app.config import Config
+from app.cache import fragment_cache
+from app.gaps import gap_monitor
+from app.events import bus
+from app.models import Caregiver, RotationTemplate
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """A freshly seeded app on its own SQLite file."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Config, 'POLISH_SECONDS', 0)
+    # Process-wide caches are keyed on data versions, which restart with every database
+    monkeypatch.setattr(shift_types, '_registry', None)
+    monkeypatch.setattr(facilities, '_default_facility_id', None)
+    monkeypatch.setattr(roster, '_indexes', {})
+    monkeypatch.setattr(gap_monitor, '_indexes', {})
+    monkeypatch.setattr(gap_monitor, '_versions', None)
+    monkeypatch.setattr(gap_monitor, '_events', None)
+    fragment_cache.clear()
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    if gap_monitor._events is not None:
+        bus.unsubscribe(gap_monitor._events)
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def caregivers(app):
+    """{name: id} for the seeded caregivers."""
+    with app.app_context():
+        return {c.name: c.id for c in Caregiver.query.all()}
+
+@pytest.fixture
+def repeating_rotation(app):
+    """Let the seeded one-week rotation repeat every week."""
+    with app.app_context():
+        RotationTemplate.query.first().until = None
+        db.session.commit()
+
+@pytest.fixture
+def next_monday():
+    today = date.today()
+    return today + timedelta(days=7 - today.weekday())
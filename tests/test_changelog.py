@@ -0,0 +1,22 @@
+from app.events import bus
+
+def test_removing_rotation_shift_is_logged_as_shift_delete(client, next_monday):
+    shift_id = f"rotation-1-{next_monday}"
+    events = bus.subscribe()
+    try:
+        assert client.post('/remove_shift', data={'shift_id': shift_id}).status_code == 200
+        published = [events.get_nowait() for _ in range(events.qsize())]
+    finally:
+        bus.unsubscribe(events)
+
+    assert [(e['type'], e['shift']['id']) for e in published] == [('shift_removed', shift_id)]
+    change = client.get('/api/changes?since=0').json['changes'][-1]
+    assert (change['entity'], change['id'], change['action']) == ('shift', shift_id, 'delete')
+    assert change['data']['shift_type'] == 'A'
+
+def test_stored_shift_ids_stay_numeric(client, caregivers, next_monday):
+    client.post('/remove_shift', data={'shift_id': f"rotation-1-{next_monday}"})
+    client.post('/add_shift', data={'caregiver_id': caregivers['Kisha'], 'shift_type': 'A',
+                                    'date': next_monday.isoformat()})
+    changes = client.get('/api/changes?since=0').json['changes']
+    assert [(c['entity'], c['id'], c['action']) for c in changes][-1] == ('shift', 1, 'upsert')
@@ -0,0 +1,65 @@
+import random
+from datetime import date, timedelta
+from app.conflicts import OccupancyIndex, _trailing_ones
+from app.shift_types import get_registry
+
+BASE = date(2026, 1, 5)
+
+def _interval(day, shift_type):
+    definition = get_registry().get(shift_type)
+    start = 24 * (day - BASE).days + definition.start_hour
+    return start, start + definition.duration
+
+def _naive_check(shifts, day, shift_type, min_rest, max_consecutive):
+    """The rules written out over hour intervals and sets of dates."""
+    start, end = _interval(day, shift_type)
+    intervals = [_interval(d, t) for d, t in shifts]
+    conflicts = []
+    if any(s < end and start < e for s, e in intervals):
+        conflicts.append('overlaps an existing shift')
+    elif any(max(start - e, s - end) < min_rest for s, e in intervals):
+        conflicts.append(f'less than {min_rest} hours rest from an adjacent shift')
+    worked = {d for d, _ in shifts} | {day}
+    run, before, after = 1, day - timedelta(days=1), day + timedelta(days=1)
+    while before in worked:
+        run, before = run + 1, before - timedelta(days=1)
+    while after in worked:
+        run, after = run + 1, after + timedelta(days=1)
+    if run > max_consecutive:
+        conflicts.append(f'more than {max_consecutive} consecutive working days')
+    return conflicts
+
+def test_trailing_ones():
+    assert [_trailing_ones(x) for x in (0, 1, 0b10, 0b11, 0b1011, 0b111)] == [0, 1, 0, 2, 2, 3]
+
+def test_overlap_rest_and_run_length(app):
+    with app.app_context():
+        index = OccupancyIndex(BASE)
+        index.add(1, BASE, 'B')  # 16:00-24:00
+        assert index.check(1, BASE, 'G1') == ['overlaps an existing shift']
+        assert index.check(1, BASE + timedelta(days=1), 'C') == ['less than 8 hours rest from an adjacent shift']
+        assert index.check(1, BASE + timedelta(days=1), 'A') == ['less than 8 hours rest from an adjacent shift']
+        assert index.check(1, BASE + timedelta(days=1), 'G1') == []
+
+        for day in range(1, 6):
+            index.add(1, BASE + timedelta(days=day), 'B')
+        assert index.check(1, BASE + timedelta(days=6), 'B') == ['more than 6 consecutive working days']
+        index.remove(1, BASE + timedelta(days=3), 'B')
+        assert index.check(1, BASE + timedelta(days=6), 'B') == []
+        assert index.consecutive_days(1, 3) == 6
+
+def test_matches_naive_rules(app):
+    rng = random.Random(29)
+    with app.app_context():
+        codes = list(get_registry().codes())
+        for _ in range(200):
+            shifts = {(BASE + timedelta(days=rng.randrange(21)), rng.choice(codes)) for _ in range(rng.randrange(1, 15))}
+            index = OccupancyIndex(BASE)
+            for day, shift_type in shifts:
+                index.add(1, day, shift_type)
+            for _ in range(10):
+                day, shift_type = BASE + timedelta(days=rng.randrange(21)), rng.choice(codes)
+                if (day, shift_type) in shifts:
+                    continue
+                assert index.check(1, day, shift_type) == _naive_check(
+                    shifts, day, shift_type, index.min_rest, index.max_consecutive), (sorted(shifts), day, shift_type)
@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from app import db
+from app.gaps import gap_monitor, GapIndex
+from app.models import Caregiver
+
+def _missing(client, day, shift_type):
+    gaps = client.get('/api/gaps?limit=1000').json['gaps']
+    return next((g['missing'] for g in gaps if g['date'] == day.isoformat() and g['shift_type'] == shift_type), 0)
+
+def _rotation_id(client, day, shift_type):
+    shifts = client.get(f'/api/schedule?start={day}&end={day + timedelta(days=1)}').json['shifts']
+    return next(s['id'] for s in shifts if s['shift_type'] == shift_type and s['source'] == 'rotation')
+
+def test_local_changes_update_the_index_in_place(app, client):
+    day = date.today() + timedelta(days=2)
+    client.post('/api/caregivers', json={'name': 'Relief'})
+    assert _missing(client, day, 'A') == 0
+    index = gap_monitor._indexes[1]
+
+    client.post('/remove_shift', data={'shift_id': _rotation_id(client, day, 'A')})
+    assert _missing(client, day, 'A') == 1
+    with app.app_context():
+        relief = Caregiver.query.filter_by(name='Relief').one().id
+    assert client.post('/add_shift', data={'caregiver_id': relief, 'shift_type': 'A',
+                                           'date': day.isoformat()}).status_code == 200
+    assert _missing(client, day, 'A') == 0
+    assert gap_monitor._indexes[1] is index
+
+    with app.app_context():
+        fresh = GapIndex.load(1, index.start_date, index.end_date)
+        now = datetime.now()
+        assert fresh.gaps(now) == index.gaps(now)
+
+def test_changes_from_another_process_rebuild_the_index(app, client):
+    day = date.today() + timedelta(days=2)
+    assert _missing(client, day, 'A') == 0
+    index = gap_monitor._indexes[1]
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO rotation_skip (template_id, entry_id, date) "
+                              "SELECT template_id, id, :day FROM rotation_entry WHERE weekday = :weekday AND shift_type = 'A'"),
+                         {'day': day.isoformat(), 'weekday': day.weekday()})
+            conn.execute(text("UPDATE data_version SET version = version + 1 WHERE name = 'rotation'"))
+
+    assert _missing(client, day, 'A') == 1
+    assert gap_monitor._indexes[1] is not index
+
+def test_remote_write_between_local_events_is_noticed(app, client):
+    day = date.today() + timedelta(days=2)
+    _missing(client, day, 'A')
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE data_version SET version = version + 1 WHERE name = 'rotation'"))
+    client.post('/remove_shift', data={'shift_id': _rotation_id(client, day, 'A')})
+    index = gap_monitor._indexes[1]
+    assert _missing(client, day, 'A') == 1
+    assert gap_monitor._indexes[1] is not index
+
+def test_gap_is_alerted_again_when_it_grows(app, client):
+    day = date.today() + timedelta(days=1)
+    client.put('/api/shift-types/A', json={'headcount': [2] * 7})
+    with app.app_context():
+        sent = gap_monitor.check_alerts()
+        assert [(a['date'], a['shift_type'], a['missing']) for a in sent if a['shift_type'] == 'A' and a['date'] == day.isoformat()] \
+            == [(day.isoformat(), 'A', 1)]
+        assert not [a for a in gap_monitor.check_alerts() if a['shift_type'] == 'A']
+
+    client.post('/remove_shift', data={'shift_id': _rotation_id(client, day, 'A')})
+    with app.app_context():
+        sent = gap_monitor.check_alerts()
+        assert [(a['date'], a['missing']) for a in sent if a['shift_type'] == 'A'] == [(day.isoformat(), 2)]
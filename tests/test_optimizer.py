@@ -0,0 +1,83 @@
+import random
+import pytest
+from collections import Counter
+from app import db
+from app.models import Shift
+from app.optimizer import WeekState, anneal, polish_week
+from app.schedule_generator import generate_schedule
+from app.config import ShiftConfig
+
+@pytest.fixture
+def week(app, client, next_monday):
+    """A generated week of stored shifts, with the seeded rotation out of the way."""
+    client.delete('/api/rotations/1')
+    with app.test_request_context():
+        generate_schedule(next_monday)
+    return next_monday
+
+def _check_rules(state):
+    per_day = Counter((cid, date) for cid, (date, _) in zip(state.assigned, state.slots))
+    assert max(per_day.values()) == 1
+    per_week = Counter(state.assigned)
+    assert max(per_week.values()) <= ShiftConfig.SHIFTS_PER_WEEK
+    for index, cid in enumerate(state.assigned):
+        date, shift_type = state.slots[index]
+        assert state.slot_cost(index, cid) is not None
+        state.occupancy.remove(cid, date, shift_type)
+        assert state.occupancy.can_assign(cid, date, shift_type)
+        state.occupancy.add(cid, date, shift_type)
+
+def test_move_and_swap_deltas_match_the_objective(app, week):
+    rng = random.Random(35)
+    with app.test_request_context():
+        state = WeekState.load(week)
+        checked = 0
+        for _ in range(300):
+            before = state.objective()
+            if rng.random() < 0.5:
+                i, cid = rng.randrange(len(state.slots)), rng.choice(state.caregiver_ids)
+                delta, apply = state.try_move(i, cid), lambda: state.apply_move(i, cid)
+            else:
+                i, j = rng.randrange(len(state.slots)), rng.randrange(len(state.slots))
+                delta, apply = state.try_swap(i, j), lambda: state.apply_swap(i, j)
+            if delta is None:
+                continue
+            apply()
+            assert state.objective() - before == pytest.approx(delta)
+            checked += 1
+        assert checked
+        _check_rules(state)
+
+def test_anneal_never_ends_worse_and_keeps_the_rules(app, week):
+    with app.test_request_context():
+        state = WeekState.load(week)
+        best_assigned, stats = anneal(state, 0.3, seed=35)
+        assert stats['best'] <= stats['initial']
+        assert [best for _, best in stats['history']] == sorted((best for _, best in stats['history']), reverse=True)
+
+        replay = WeekState.load(week)
+        for index, cid in enumerate(best_assigned):
+            if cid != replay.assigned[index]:
+                replay.apply_move(index, cid)
+        assert replay.objective() == pytest.approx(stats['best'], abs=1e-3)
+        _check_rules(replay)
+
+def test_polish_week_improves_a_shuffled_week(app, week):
+    rng = random.Random(35)
+    with app.test_request_context():
+        # Push the generated week away from its balance with random legal moves
+        state = WeekState.load(week)
+        for _ in range(500):
+            i, cid = rng.randrange(len(state.slots)), rng.choice(state.caregiver_ids)
+            if state.try_move(i, cid) is not None:
+                state.apply_move(i, cid)
+        for shift in Shift.query.filter(Shift.id.in_(state.shift_ids)).all():
+            shift.caregiver_id = state.assigned[state.shift_ids.index(shift.id)]
+        db.session.commit()
+
+        stats = polish_week(week, 0.5, seed=35)
+        assert stats['reassigned'] and stats['best'] < stats['initial']
+        polished = WeekState.load(week)
+        # Reloaded, the moved shifts no longer carry the change penalty
+        assert polished.objective() <= stats['best'] + 1e-6
+        _check_rules(polished)
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+import pytest
+from app import db
+from app.config import ShiftConfig
+from app.models import Shift, ShiftArchive
+from app.payroll import pay_period, compute_payroll, payroll_report
+from app.rotations import schedule_between
+
+@pytest.fixture
+def period(app, client):
+    """(start, end) of a closed pay period, with the seeded rotation removed."""
+    client.delete('/api/rotations/1')
+    with app.app_context():
+        return pay_period(date(2026, 3, 4))
+
+def _add(caregiver_id, day, shift_type, archived=False):
+    if archived:
+        db.session.add(ShiftArchive(facility_id=1, caregiver_id=caregiver_id, date=day, shift_type=shift_type))
+    else:
+        db.session.add(Shift(facility_id=1, caregiver_id=caregiver_id, date=day, shift_type=shift_type))
+
+def _line(report, caregiver_id):
+    return next(line for line in report['caregivers'] if line['caregiver_id'] == caregiver_id)
+
+def test_overtime_is_counted_per_week(app, period, caregivers):
+    start, _ = period
+    maria = caregivers['Maria B']
+    with app.test_request_context():
+        for day in range(6):  # 48 hours in the first week
+            _add(maria, start + timedelta(days=day), 'A')
+        for day in range(3):  # 24 in the second
+            _add(maria, start + timedelta(days=7 + day), 'A')
+        db.session.commit()
+
+        line = _line(payroll_report(start), maria)
+    assert (line['hours'], line['regular_hours'], line['overtime_hours']) == (72, 64, 8)
+    assert line['weekly_hours'] == [48, 24]
+
+def test_night_weekend_and_holiday_hours(app, period, caregivers, monkeypatch):
+    start, _ = period
+    saturday = start + timedelta(days=5)
+    monkeypatch.setattr(ShiftConfig, 'HOLIDAYS', frozenset({saturday.isoformat()}))
+    kisha = caregivers['Kisha']
+    with app.test_request_context():
+        _add(kisha, start, 'C')
+        _add(kisha, saturday, 'A', archived=True)
+        db.session.commit()
+        line = compute_payroll(*period)[kisha]
+    assert line['shifts'] == 2 and line['hours'] == 16
+    assert (line['night_hours'], line['weekend_hours'], line['holiday_hours']) == (8, 8, 8)
+
+def test_rotation_shifts_are_paid(app, client, caregivers):
+    with app.test_request_context():
+        start, end = pay_period(date.today())
+        lines = compute_payroll(start, end)
+        expected = {}
+        for shift in schedule_between(start, end):
+            expected[shift.caregiver_id] = expected.get(shift.caregiver_id, 0) + shift.duration_hours
+    assert {cid: line['hours'] for cid, line in lines.items()} == expected
+
+def test_closed_period_cache_is_dropped_when_a_shift_changes(app, period, caregivers):
+    start, _ = period
+    with app.test_request_context():
+        _add(caregivers['Fatima'], start, 'B')
+        db.session.commit()
+        assert not payroll_report(start)['cached']
+        assert payroll_report(start)['cached']
+
+        _add(caregivers['Fatima'], start + timedelta(days=1), 'B')
+        db.session.commit()
+        report = payroll_report(start)
+    assert not report['cached']
+    assert _line(report, caregivers['Fatima'])['hours'] == 16
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from app import db
+from app.models import Shift, ShiftArchive, RotationTemplate
+from app.retention import archive_shifts, retention_cutoff
+from app.rotations import expand
+
+def _add_old_shifts(caregiver_id, cutoff, count):
+    for day in range(count):
+        db.session.add(Shift(facility_id=1, caregiver_id=caregiver_id,
+                             date=cutoff - timedelta(days=day + 1), shift_type='A'))
+    db.session.commit()
+
+def test_archiving_twice_keeps_every_shift(app, caregivers):
+    cutoff = retention_cutoff(4)
+    with app.app_context():
+        _add_old_shifts(caregivers['Maria B'], cutoff, 2)
+        assert archive_shifts(4) == 2
+        # SQLite hands the freed shift ids out again
+        _add_old_shifts(caregivers['Kisha'], cutoff, 2)
+        assert archive_shifts(4) == 2
+
+        archived = ShiftArchive.query.all()
+        assert len(archived) == 4
+        assert Shift.query.filter(Shift.date < cutoff).count() == 0
+
+def _history(client, start, end):
+    response = client.get(f'/api/history/hours?period=week&start={start}&end={end}')
+    assert response.status_code == 200
+    return {(row['caregiver_id'], row['period_start']): (row['shifts'], row['hours'])
+            for row in response.json['history']}
+
+def _this_monday():
+    today = date.today()
+    return today - timedelta(days=today.weekday())
+
+def test_history_counts_rotation_shifts(app, client):
+    monday = _this_monday()
+    with app.app_context():
+        hours = [shift.duration_hours for shift in expand(monday, monday + timedelta(days=7))]
+    history = _history(client, monday, monday + timedelta(days=7))
+    assert sum(count for count, _ in history.values()) == len(hours) > 0
+    assert sum(total for _, total in history.values()) == sum(hours)
+
+def test_archived_rotation_shifts_stay_in_history(app, client):
+    monday = _this_monday()
+    start = monday - timedelta(weeks=3)
+    with app.app_context():
+        RotationTemplate.query.first().start_date = start
+        db.session.commit()
+        expired = len(expand(start, monday))
+    before = _history(client, start, monday + timedelta(days=7))
+
+    with app.app_context():
+        assert archive_shifts(0) == expired > 0
+        assert RotationTemplate.query.first().start_date == monday
+        assert ShiftArchive.query.count() == expired
+        assert expand(start, monday) == []
+    assert _history(client, start, monday + timedelta(days=7)) == before
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from app.models import RotationSkip
+
+def _slot(client, day, shift_type):
+    shifts = client.get(f'/api/schedule?start={day}&end={day + timedelta(days=1)}').json['shifts']
+    return sorted((s['caregiver_name'], s['source']) for s in shifts if s['shift_type'] == shift_type)
+
+def _gap(client, day, shift_type):
+    gaps = client.get('/api/gaps?limit=1000').json['gaps']
+    return next((g['missing'] for g in gaps if g['date'] == day.isoformat() and g['shift_type'] == shift_type), 0)
+
+def test_stored_shift_does_not_hide_rotation_shift(client, caregivers, next_monday, repeating_rotation):
+    client.put('/api/shift-types/A', json={'headcount': [2, 1, 1, 1, 1, 1, 1]})
+    assert _slot(client, next_monday, 'A') == [('Maria B', 'rotation')]
+    assert _gap(client, next_monday, 'A') == 1
+
+    response = client.post('/add_shift', data={'caregiver_id': caregivers['Kisha'], 'shift_type': 'A',
+                                               'date': next_monday.isoformat()})
+    assert response.status_code == 200
+    assert _slot(client, next_monday, 'A') == [('Kisha', 'shift'), ('Maria B', 'rotation')]
+    assert _gap(client, next_monday, 'A') == 0
+
+def test_removing_rotation_shift_skips_only_that_entry(app, client, caregivers, next_monday, repeating_rotation):
+    client.put('/api/shift-types/A', json={'headcount': [2, 1, 1, 1, 1, 1, 1]})
+    client.post('/add_shift', data={'caregiver_id': caregivers['Kisha'], 'shift_type': 'A',
+                                    'date': next_monday.isoformat()})
+    shifts = client.get(f'/api/schedule?start={next_monday}&end={next_monday + timedelta(days=1)}').json['shifts']
+    rotation_id = next(s['id'] for s in shifts if s['shift_type'] == 'A' and s['source'] == 'rotation')
+
+    assert client.post('/remove_shift', data={'shift_id': rotation_id}).status_code == 200
+    assert _slot(client, next_monday, 'A') == [('Kisha', 'shift')]
+    assert _gap(client, next_monday, 'A') == 1
+    with app.app_context():
+        assert RotationSkip.query.count() == 1
+
+def test_template_from_week_keeps_one_copy_of_stored_shifts(client, caregivers, next_monday, repeating_rotation):
+    client.post('/remove_shift', data={'shift_id': f"rotation-1-{next_monday}"})
+    client.post('/add_shift', data={'caregiver_id': caregivers['Kisha'], 'shift_type': 'A',
+                                    'date': next_monday.isoformat()})
+    client.delete('/api/rotations/1')
+
+    response = client.post('/api/rotations', json={'name': 'Kisha on A', 'from_week': next_monday.isoformat()})
+    assert response.json['success']
+    assert _slot(client, next_monday, 'A') == [('Kisha', 'shift')]
+    following = next_monday + timedelta(weeks=1)
+    assert _slot(client, following, 'A') == [('Kisha', 'rotation')]
+
+def test_malformed_rotation_id_is_rejected(client):
+    assert client.post('/remove_shift', data={'shift_id': 'rotation-x'}).status_code == 400
+    assert client.post('/remove_shift', data={'shift_id': 'rotation-1-2026-13-01'}).status_code == 400
+
+def test_unknown_rotation_is_not_found(client):
+    assert client.delete('/api/rotations/999').status_code == 404
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+from app import db
+from app.models import Shift, ShiftType
+from app.shift_types import get_registry
+
+def test_code_must_be_short_and_alphanumeric(client):
+    for code in ('LONG', 'A-1', 'a b'):
+        response = client.put(f'/api/shift-types/{code}', json={'start_hour': 9, 'duration': 4})
+        assert response.status_code == 400
+    assert client.put('/api/shift-types/D2', json={'start_hour': 9, 'duration': 4}).status_code == 200
+
+def test_new_type_is_unstaffed_by_default(app, client):
+    client.put('/api/shift-types/D', json={'start_hour': 9, 'duration': 4})
+    client.put('/api/shift-types/E', json={'start_hour': 9, 'duration': 4, 'headcount': [1] * 7})
+    with app.app_context():
+        assert db.session.get(ShiftType, 'D').headcount == '0,0,0,0,0,0,0'
+        assert db.session.get(ShiftType, 'E').headcount == '1,1,1,1,1,1,1'
+
+def test_hourly_view_wraps_night_shifts_past_midnight(app, client, caregivers):
+    client.put('/api/shift-types/N', json={'start_hour': 22, 'duration': 8})
+    today = date.today()
+    with app.app_context():
+        registry = get_registry()
+        assert [h for h in range(48) if registry.covers('N', h)] == [22, 23] + list(range(24, 30))
+        # The Sunday before the displayed week and the week's own Sunday
+        for day in (-1, 6):
+            db.session.add(Shift(facility_id=1, caregiver_id=caregivers['Kisha'], shift_type='N',
+                                 date=today - timedelta(days=today.weekday() - day)))
+        db.session.commit()
+
+    page = client.get('/hourly').get_data(as_text=True)
+    # Monday 0-5 from the previous Sunday's shift, Sunday 22-23 from this week's
+    assert page.count('<span class="shift-type shift-N">N</span>') == 6 + 2
@@ -0,0 +1,9 @@
+def test_add_shift_rejects_malformed_caregiver_id(client, next_monday):
+    response = client.post('/add_shift', data={'caregiver_id': 'abc', 'shift_type': 'A',
+                                               'date': next_monday.isoformat()})
+    assert response.status_code == 400
+
+def test_add_shift_unknown_caregiver(client, next_monday):
+    response = client.post('/add_shift', data={'caregiver_id': 999, 'shift_type': 'A',
+                                               'date': next_monday.isoformat()})
+    assert response.status_code == 404
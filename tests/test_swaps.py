@@ -0,0 +1,80 @@
+from datetime import timedelta
+import pytest
+from app import db
+from app.models import Shift, RotationSkip
+from app.swaps import SwapIndex
+
+@pytest.fixture
+def week(app, client, next_monday):
+    """Stored shifts only: the seeded rotation is removed."""
+    client.delete('/api/rotations/1')
+    return next_monday
+
+def _stored(app, rows):
+    """Insert (caregiver_id, day, shift_type) rows; returns their ids in order."""
+    with app.test_request_context():
+        shifts = [Shift(facility_id=1, caregiver_id=cid, date=day, shift_type=shift_type) for cid, day, shift_type in rows]
+        db.session.add_all(shifts)
+        db.session.commit()
+        return [shift.id for shift in shifts]
+
+def _reasons(app, shift_id, other_id):
+    with app.test_request_context():
+        day = Shift.query.get(shift_id).date
+        index = SwapIndex.load(day, 14)
+        return index.check_swap(index.get(shift_id), index.get(other_id))
+
+def test_same_caregiver_and_same_slot(app, week, caregivers):
+    maria, kisha = caregivers['Maria B'], caregivers['Kisha']
+    a, b, c = _stored(app, [(maria, week, 'A'), (maria, week + timedelta(days=1), 'A'), (kisha, week, 'A')])
+    assert _reasons(app, a, b) == ['both shifts belong to the same caregiver']
+    assert _reasons(app, a, c) == ['both shifts are in the same slot']
+
+def test_already_working_that_day(app, week, caregivers):
+    maria, kisha = caregivers['Maria B'], caregivers['Kisha']
+    tuesday = week + timedelta(days=1)
+    give, take, _, _ = _stored(app, [(maria, week, 'A'), (kisha, tuesday, 'G1'),
+                                     (kisha, week, 'B'), (maria, tuesday, 'C')])
+    assert _reasons(app, give, take) == ['partner already works that day', 'requester already works that day']
+
+def test_weekly_shift_cap(app, week, caregivers):
+    maria, kisha = caregivers['Maria B'], caregivers['Kisha']
+    following = week + timedelta(weeks=1)
+    rows = [(maria, following, 'G1'), (kisha, week, 'G1')]
+    rows += [(kisha, following + timedelta(days=day), 'G1') for day in range(1, 6)]
+    give, take = _stored(app, rows)[:2]
+    assert _reasons(app, give, take) == ['partner would exceed the weekly shift cap']
+
+def test_rest_and_availability(app, client, week, caregivers):
+    maria, kisha = caregivers['Maria B'], caregivers['Kisha']
+    tuesday, wednesday = week + timedelta(days=1), week + timedelta(days=2)
+    # Kisha's Monday B shift ends at midnight, six hours before Maria's Tuesday A shift
+    give, take, _ = _stored(app, [(maria, tuesday, 'A'), (kisha, wednesday, 'G1'), (kisha, week, 'B')])
+    assert _reasons(app, give, take) == ['partner is unavailable or would break rest/consecutive-day rules']
+
+    client.put(f'/api/caregivers/{maria}/availability',
+               json={'windows': [{'weekday': tuesday.weekday(), 'start_hour': 0, 'end_hour': 24}]})
+    assert _reasons(app, give, take) == ['partner is unavailable or would break rest/consecutive-day rules',
+                                         'requester is unavailable or would break rest/consecutive-day rules']
+
+def test_allowed_swap_is_applied(app, client, week, caregivers):
+    maria, kisha = caregivers['Maria B'], caregivers['Kisha']
+    give, take = _stored(app, [(maria, week, 'A'), (kisha, week + timedelta(days=2), 'A')])
+    assert _reasons(app, give, take) == []
+    assert client.post('/api/swaps', json={'shift_id': give, 'partner_shift_id': take}).status_code == 200
+    with app.app_context():
+        assert (Shift.query.get(give).caregiver_id, Shift.query.get(take).caregiver_id) == (kisha, maria)
+
+def test_swapping_rotation_shifts_replaces_only_those_occurrences(app, client, next_monday, repeating_rotation):
+    shifts = client.get(f'/api/schedule?start={next_monday}&end={next_monday + timedelta(days=7)}').json['shifts']
+    candidates = client.get(f"/api/shifts/{shifts[0]['id']}/swaps?days=7").json['candidates']
+    assert candidates
+    other = candidates[0]['shift_id']
+
+    response = client.post('/api/swaps', json={'shift_id': shifts[0]['id'], 'partner_shift_id': other})
+    assert response.status_code == 200
+    with app.app_context():
+        assert RotationSkip.query.count() == 2
+        assert Shift.query.count() == 2
+    after = client.get(f'/api/schedule?start={next_monday}&end={next_monday + timedelta(days=7)}').json['shifts']
+    assert len(after) == len(shifts)
@@ -0,0 +1,24 @@
+def _dry_run(client, *scenarios):
+    response = client.post('/api/schedule/dry-run', json={'scenarios': list(scenarios)})
+    assert response.status_code == 200
+    return response.json
+
+def _slots(shifts):
+    return sorted((s['date'], s['shift_type']) for s in shifts)
+
+def test_excluded_caregiver_rotation_shifts_are_replanned(client, caregivers):
+    maria = caregivers['Maria B']
+    result = _dry_run(client, {'name': 'without Maria', 'exclude_caregivers': [maria]})
+    theirs = [s for s in result['stored'] if s['caregiver_id'] == maria]
+    assert theirs
+
+    scenario = result['scenarios'][0]
+    assert all(s['caregiver_id'] != maria for s in scenario['schedule'])
+    assert _slots(s for s in scenario['diff']['removed'] if s['caregiver_id'] == maria) == _slots(theirs)
+    # Each freed slot went to someone else
+    replanned = [s for s in scenario['diff']['added'] if (s['date'], s['shift_type']) in _slots(theirs)]
+    assert _slots(replanned) == _slots(theirs)
+
+def test_unknown_shift_type_in_headcount_is_rejected(client):
+    response = client.post('/api/schedule/dry-run', json={'scenarios': [{'headcount': {'Z': 1}}]})
+    assert response.status_code == 400
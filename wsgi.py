@@ -4,6 +4,15 @@ import sys
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Under gevent workers, let psycopg2 wait on the event loop instead of blocking the worker
+try:
+    from gevent import monkey
+    if monkey.is_module_patched('socket'):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+except ImportError:
+    pass
+
 from app import app
 
 if __name__ == "__main__":